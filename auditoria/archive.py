@@ -0,0 +1,120 @@
+"""Retención de logs de auditoría con archivo mensual comprimido.
+
+Los logs más antiguos que la retención se escriben en segmentos mensuales
+``YYYY-MM.ndjson.gz`` (por mes UTC) y luego se borran por bloques. Cada bloque
+se añade al segmento como un miembro gzip nuevo, así que los archivos solo
+crecen por el final y se leen con ``gzip.open`` como un único flujo.
+"""
+import gzip
+import json
+import os
+from datetime import timedelta, timezone as dt_timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .exports import log_to_record
+from .models import AuditLog, AuditRollupWatermark
+from .rollup import refresh_rollup
+
+DEFAULT_RETENTION_DAYS = 365
+ARCHIVE_CHUNK_SIZE = 5000
+
+
+def archive_dir():
+    return Path(getattr(settings, 'AUDIT_ARCHIVE_DIR', settings.BASE_DIR / 'audit_archive'))
+
+
+def segment_path(month):
+    """Ruta del segmento de un mes (``'YYYY-MM'``)"""
+    return archive_dir() / f'{month}.ndjson.gz'
+
+
+def _month(moment):
+    return moment.astimezone(dt_timezone.utc).strftime('%Y-%m')
+
+
+def _append_segment(month, records):
+    path = segment_path(month)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    lines = ''.join(
+        json.dumps(record, ensure_ascii=False, cls=DjangoJSONEncoder) + '\n' for record in records
+    )
+    with open(path, 'ab') as segment:
+        segment.write(gzip.compress(lines.encode('utf-8')))
+        segment.flush()
+        # Los logs solo se borran cuando el bloque está en disco
+        os.fsync(segment.fileno())
+
+
+def archive_logs(days=None, chunk_size=ARCHIVE_CHUNK_SIZE):
+    """Archivar y borrar los logs anteriores a la retención.
+
+    Antes se actualiza el resumen diario, y solo se archivan logs ya
+    incluidos en él, para que las estadísticas históricas no cambien.
+    Devuelve el número de logs archivados.
+    """
+    days = days or getattr(settings, 'AUDIT_RETENTION_DAYS', DEFAULT_RETENTION_DAYS)
+    cutoff = timezone.now() - timedelta(days=days)
+
+    refresh_rollup()
+    queryset = AuditLog.objects.filter(
+        timestamp__lt=cutoff,
+        id__lte=AuditRollupWatermark.current()
+    )
+
+    archived = 0
+    while True:
+        # Cada bloque vuelve a empezar por el más antiguo: los anteriores ya se borraron
+        chunk = list(queryset.select_related('user').order_by('timestamp', 'id')[:chunk_size])
+        if not chunk:
+            return archived
+
+        by_month = {}
+        for log in chunk:
+            by_month.setdefault(_month(log.timestamp), []).append(log_to_record(log))
+        for month, records in sorted(by_month.items()):
+            _append_segment(month, records)
+
+        AuditLog.objects.filter(id__in=[log.id for log in chunk]).delete()
+        archived += len(chunk)
+
+
+def _months_between(start, end):
+    year, month = int(_month(start)[:4]), int(_month(start)[5:])
+    last = _month(end)
+    while True:
+        current = f'{year:04d}-{month:02d}'
+        yield current
+        if current >= last:
+            return
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def read_archive(start, end, user_id=None, action=None, object_type=None):
+    """Leer del archivo los logs con ``start <= timestamp < end``"""
+    for month in _months_between(start, end):
+        path = segment_path(month)
+        if not path.exists():
+            continue
+        # Un bloque reintentado tras un fallo puede estar repetido
+        seen = set()
+        with gzip.open(path, 'rt', encoding='utf-8') as segment:
+            for line in segment:
+                record = json.loads(line)
+                if record['id'] in seen:
+                    continue
+                seen.add(record['id'])
+                moment = parse_datetime(record['timestamp'])
+                if not start <= moment < end:
+                    continue
+                if user_id is not None and record['user_id'] != user_id:
+                    continue
+                if action is not None and record['action'] != action:
+                    continue
+                if object_type is not None and record['object_type'] != object_type:
+                    continue
+                yield record
@@ -0,0 +1,92 @@
+"""Buffer de escritura para los logs de auditoría.
+
+Los registros se encolan cuando la transacción que los generó hace commit
+(``transaction.on_commit``), de modo que el trabajo revertido no deja logs.
+Dentro de un ámbito de buffer (una petición o un comando de gestión) se
+escriben todos juntos con un único ``bulk_create``; fuera de él se guardan
+en cuanto la transacción confirma.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+
+_current_buffer = ContextVar('audit_buffer', default=None)
+
+
+class AuditBuffer:
+    """Acumula logs de auditoría y los escribe por lotes"""
+
+    def __init__(self, max_size=None, max_age=None):
+        self.max_size = max_size or getattr(settings, 'AUDIT_BUFFER_MAX_SIZE', 500)
+        self.max_age = max_age or getattr(settings, 'AUDIT_BUFFER_MAX_AGE', 5.0)
+        self.entries = []
+        self.started_at = None
+
+    def append(self, entry):
+        if not self.entries:
+            self.started_at = time.monotonic()
+        self.entries.append(entry)
+        if (len(self.entries) >= self.max_size
+                or time.monotonic() - self.started_at >= self.max_age):
+            self.flush()
+
+    def flush(self):
+        """Escribir los logs pendientes con un único bulk_create"""
+        from .models import AuditLog
+
+        entries, self.entries = self.entries, []
+        self.started_at = None
+        if entries:
+            AuditLog.objects.bulk_create(entries, batch_size=self.max_size)
+        return len(entries)
+
+
+def _enqueue(entry):
+    buffer = _current_buffer.get()
+    if buffer is None:
+        entry.save()
+    else:
+        buffer.append(entry)
+
+
+def _enqueue_many(entries):
+    from .models import AuditLog
+
+    buffer = _current_buffer.get()
+    if buffer is None:
+        AuditLog.objects.bulk_create(entries)
+    else:
+        for entry in entries:
+            buffer.append(entry)
+
+
+def add_audit_log(entry):
+    """Registrar un AuditLog sin guardar; se escribe al confirmar la transacción"""
+    transaction.on_commit(partial(_enqueue, entry))
+
+
+def add_audit_logs(entries):
+    """Como ``add_audit_log`` para un lote: fuera de un buffer, un único INSERT"""
+    entries = list(entries)
+    if entries:
+        transaction.on_commit(partial(_enqueue_many, entries))
+
+
+@contextmanager
+def audit_buffer(max_size=None, max_age=None):
+    """Agrupar las escrituras de auditoría del bloque.
+
+    Para comandos de gestión largos, ``max_size`` y ``max_age`` (segundos)
+    acotan cuánto se acumula antes de volcar el buffer.
+    """
+    buffer = AuditBuffer(max_size=max_size, max_age=max_age)
+    token = _current_buffer.set(buffer)
+    try:
+        yield buffer
+    finally:
+        _current_buffer.reset(token)
+        buffer.flush()
@@ -0,0 +1,230 @@
+"""Exportación de logs de auditoría.
+
+CSV y NDJSON se emiten en streaming: el primer bloque sale tras leer las
+primeras filas. XLSX usa memoria constante (openpyxl write-only y un fichero
+temporal), pero el ZIP del libro solo se cierra tras escribir todas las
+filas, así que la descarga empieza cuando el archivo está completo.
+"""
+import csv
+import io
+import json
+import tempfile
+import zlib
+from datetime import datetime, time, timedelta
+
+import openpyxl
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment
+from openpyxl.utils import get_column_letter
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+CSV_CONTENT_TYPE = 'text/csv; charset=utf-8'
+NDJSON_GZ_CONTENT_TYPE = 'application/gzip'
+
+EXPORT_HEADERS = ['Fecha', 'Usuario', 'Acción', 'Tipo Objeto', 'ID Objeto', 'Objeto', 'Cambios', 'IP']
+
+# Filas leídas por consulta y filas usadas para calcular el ancho de las columnas
+EXPORT_CHUNK_SIZE = 2000
+WIDTH_SAMPLE_SIZE = 200
+MAX_COLUMN_WIDTH = 50
+
+FILE_CHUNK_SIZE = 64 * 1024
+
+# Campos de cada registro en las exportaciones CSV y NDJSON
+RECORD_FIELDS = [
+    'id', 'timestamp', 'user_id', 'username', 'action', 'object_type',
+    'object_id', 'object_repr', 'changes', 'ip_address', 'user_agent',
+]
+
+
+def parse_boundary(value, param, end=False):
+    """Convertir una fecha u hora ISO 8601 en un datetime aware"""
+    try:
+        moment = parse_datetime(value)
+        if moment is None:
+            day = parse_date(value)
+            if day is None:
+                raise ValueError
+            # Una fecha sin hora como límite superior incluye el día completo
+            moment = datetime.combine(day + timedelta(days=1) if end else day, time.min)
+    except ValueError:
+        raise ValidationError({param: f'Fecha inválida: {value}'})
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def filter_logs(queryset, params):
+    """Aplicar los filtros ``from``/``to``/``action``/``object_type``.
+
+    ``from`` es inclusivo; ``to`` es exclusivo si lleva hora y abarca el día
+    completo si es solo una fecha.
+    """
+    from .models import AuditLog
+
+    if params.get('from'):
+        queryset = queryset.filter(timestamp__gte=parse_boundary(params['from'], 'from'))
+    if params.get('to'):
+        queryset = queryset.filter(timestamp__lt=parse_boundary(params['to'], 'to', end=True))
+    if params.get('action'):
+        action = params['action'].upper()
+        if action not in dict(AuditLog.ACTION_CHOICES):
+            raise ValidationError({'action': f'Acción inválida: {params["action"]}'})
+        queryset = queryset.filter(action=action)
+    if params.get('object_type'):
+        queryset = queryset.filter(object_type=params['object_type'])
+    return queryset
+
+
+def iter_keyset(queryset, chunk_size=None):
+    """Recorrer el queryset por (timestamp, id) con paginación keyset.
+
+    Cada bloque es una consulta independiente que continúa después de la
+    última fila leída, sin OFFSET ni cursores abiertos durante la descarga.
+    """
+    chunk_size = chunk_size or EXPORT_CHUNK_SIZE
+    queryset = queryset.select_related('user').order_by('timestamp', 'id')
+    last = None
+    while True:
+        page = queryset
+        if last is not None:
+            page = page.filter(
+                Q(timestamp__gt=last.timestamp) | Q(timestamp=last.timestamp, id__gt=last.id)
+            )
+        page = list(page[:chunk_size])
+        yield from page
+        if len(page) < chunk_size:
+            return
+        last = page[-1]
+
+
+def log_to_record(log):
+    return {
+        'id': log.id,
+        'timestamp': log.timestamp.isoformat(),
+        'user_id': log.user_id,
+        'username': log.user.username if log.user else None,
+        'action': log.action,
+        'object_type': log.object_type,
+        'object_id': log.object_id,
+        'object_repr': log.object_repr,
+        'changes': log.changes,
+        'ip_address': log.ip_address,
+        'user_agent': log.user_agent,
+    }
+
+
+def stream_csv(logs, rows_per_chunk=500):
+    """Emitir los logs como CSV, agrupando varias filas por bloque"""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(RECORD_FIELDS)
+    pending = 1
+    for log in logs:
+        record = log_to_record(log)
+        record['changes'] = json.dumps(record['changes'], ensure_ascii=False, cls=DjangoJSONEncoder)
+        writer.writerow([record[field] for field in RECORD_FIELDS])
+        pending += 1
+        if pending >= rows_per_chunk:
+            yield output.getvalue().encode('utf-8')
+            output.seek(0)
+            output.truncate()
+            pending = 0
+    if pending:
+        yield output.getvalue().encode('utf-8')
+
+
+def stream_ndjson_gz(logs):
+    """Emitir los logs como NDJSON comprimido con gzip sobre la marcha"""
+    # wbits=31: formato gzip (cabecera y CRC) en lugar de zlib
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for log in logs:
+        line = json.dumps(log_to_record(log), ensure_ascii=False, cls=DjangoJSONEncoder) + '\n'
+        data = compressor.compress(line.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def log_to_row(log):
+    return [
+        log.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
+        log.user.username if log.user else 'N/A',
+        log.get_action_display(),
+        log.object_type,
+        log.object_id or '',
+        log.object_repr,
+        str(log.changes),
+        log.ip_address or ''
+    ]
+
+
+def column_widths(rows):
+    """Ancho de cada columna a partir de una muestra de filas"""
+    widths = [len(header) for header in EXPORT_HEADERS]
+    for row in rows:
+        for index, value in enumerate(row):
+            widths[index] = max(widths[index], len(str(value)))
+    return [min(width + 2, MAX_COLUMN_WIDTH) for width in widths]
+
+
+def write_xlsx(queryset, output):
+    """Escribir el queryset en ``output`` con openpyxl en modo write-only.
+
+    Devuelve el número de filas exportadas.
+    """
+    queryset = queryset.select_related('user')
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Logs de Auditoría")
+
+    # En modo write-only los anchos se fijan antes de escribir filas
+    sample = [log_to_row(log) for log in queryset[:WIDTH_SAMPLE_SIZE]]
+    for index, width in enumerate(column_widths(sample), start=1):
+        ws.column_dimensions[get_column_letter(index)].width = width
+
+    # Encabezados
+    header_font = Font(bold=True, color='FFFFFF')
+    header_fill = PatternFill(start_color='366092', end_color='366092', fill_type='solid')
+    header_alignment = Alignment(horizontal='center')
+
+    header_row = []
+    for header in EXPORT_HEADERS:
+        cell = WriteOnlyCell(ws, value=header)
+        cell.font = header_font
+        cell.fill = header_fill
+        cell.alignment = header_alignment
+        header_row.append(cell)
+    ws.append(header_row)
+
+    # Datos
+    rows = 0
+    for log in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        ws.append(log_to_row(log))
+        rows += 1
+
+    wb.save(output)
+    return rows
+
+
+def stream_xlsx(queryset, on_complete=None):
+    """Generar el archivo completo en disco y después emitirlo por bloques.
+
+    No es streaming de verdad: el primer byte sale cuando se han escrito todas
+    las filas. ``on_complete`` recibe el número de filas exportadas.
+    """
+    with tempfile.TemporaryFile() as output:
+        rows = write_xlsx(queryset, output)
+        output.seek(0)
+        while True:
+            chunk = output.read(FILE_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+    if on_complete:
+        on_complete(rows)
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from auditoria.archive import ARCHIVE_CHUNK_SIZE, archive_dir, archive_logs
+
+
+class Command(BaseCommand):
+    help = 'Archivar en segmentos mensuales comprimidos los logs de auditoría anteriores a la retención y borrarlos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            help='Días de retención en la tabla (por defecto AUDIT_RETENTION_DAYS)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=ARCHIVE_CHUNK_SIZE,
+            help='Logs archivados y borrados por bloque',
+        )
+
+    def handle(self, *args, **options):
+        archived = archive_logs(days=options['days'], chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'{archived} logs archivados en {archive_dir()}'))
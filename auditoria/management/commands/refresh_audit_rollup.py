@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from auditoria.rollup import rebuild_rollup, refresh_rollup
+
+
+class Command(BaseCommand):
+    help = 'Actualizar el resumen diario de auditoría con los logs nuevos desde la última ejecución'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Reconstruir el resumen completo (se pierden los días ya archivados)',
+        )
+
+    def handle(self, *args, **options):
+        days = rebuild_rollup() if options['full'] else refresh_rollup()
+        if days:
+            self.stdout.write(self.style.SUCCESS(
+                f'Resumen actualizado: {len(days)} día(s), de {days[0]} a {days[-1]}'
+            ))
+        else:
+            self.stdout.write('Sin logs nuevos')
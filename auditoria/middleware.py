@@ -0,0 +1,12 @@
+from .buffer import audit_buffer
+
+
+class AuditBufferMiddleware:
+    """Escribir los logs de auditoría de cada petición en un solo INSERT"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with audit_buffer():
+            return self.get_response(request)
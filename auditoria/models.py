@@ -1,12 +1,28 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.db.models.signals import post_save, post_delete
-from django.dispatch import receiver
+from django.utils import timezone
 import json
 import logging
 
+from .buffer import add_audit_log
+from .tracking import get_changes, take_snapshot, track
+
 logger = logging.getLogger('audit')
 
+# Modelos auditados, con seguimiento de cambios en memoria
+AUDITED_MODELS = [
+    'libros.Libro',
+    'libros.Autor',
+    'libros.Genero',
+    'libros.Prestamo',
+    'usuarios.PerfilUsuario',
+    'auth.User',
+]
+
+for model_label in AUDITED_MODELS:
+    track(model_label)
+
 class AuditLog(models.Model):
     ACTION_CHOICES = [
         ('CREATE', 'Creación'),
@@ -24,7 +40,8 @@ class AuditLog(models.Model):
     object_id = models.PositiveIntegerField(null=True, blank=True)
     object_repr = models.CharField(max_length=200, blank=True)
     changes = models.JSONField(default=dict)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Se asigna al crear la instancia, no al volcar el buffer
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     user_agent = models.TextField(blank=True)
     
@@ -32,63 +49,98 @@ class AuditLog(models.Model):
         verbose_name = "Log de Auditoría"
         verbose_name_plural = "Logs de Auditoría"
         ordering = ['-timestamp']
+        indexes = [
+            # Historial por usuario (get_queryset de usuarios no bibliotecarios)
+            models.Index(fields=['user', '-timestamp'], name='auditlog_user_ts_idx'),
+            # Listados ordenados, estadísticas y exportaciones por rango de fechas
+            models.Index(fields=['timestamp'], name='auditlog_ts_idx'),
+            # Historial de un objeto concreto
+            models.Index(fields=['object_type', 'object_id'], name='auditlog_object_idx'),
+            # Filtros por acción en el admin y las exportaciones
+            models.Index(fields=['action', 'timestamp'], name='auditlog_action_ts_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user} - {self.action} - {self.object_type} - {self.timestamp}"
 
-def create_audit_log(sender, instance, action, **kwargs):
+class AuditDailyRollup(models.Model):
+    """Conteo diario de logs por acción, tipo de objeto y usuario"""
+    date = models.DateField()
+    action = models.CharField(max_length=20, choices=AuditLog.ACTION_CHOICES)
+    object_type = models.CharField(max_length=50)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        verbose_name = "Resumen diario de auditoría"
+        verbose_name_plural = "Resúmenes diarios de auditoría"
+        ordering = ['-date']
+        indexes = [
+            models.Index(fields=['date', 'action', 'object_type', 'user'], name='auditrollup_key_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.date} - {self.action} - {self.object_type} - {self.user}: {self.count}"
+
+class AuditRollupWatermark(models.Model):
+    """Último AuditLog incluido en AuditDailyRollup"""
+    last_log_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Marca de agua del resumen de auditoría"
+    
+    def __str__(self):
+        return f"{self.last_log_id} ({self.updated_at})"
+    
+    @classmethod
+    def current(cls):
+        watermark = cls.objects.filter(pk=1).values_list('last_log_id', flat=True).first()
+        return watermark or 0
+
+def create_audit_log(sender, instance, action, update_fields=None, **kwargs):
     """Función helper para crear logs de auditoría"""
     try:
-        if sender == AuditLog or sender._meta.label in ['auth.Permission', 'contenttypes.ContentType', 'sessions.Session']:
+        # Solo auditar modelos importantes
+        if sender == AuditLog or sender._meta.label not in AUDITED_MODELS:
             return
         
-        # Solo auditar modelos importantes
-        important_models = ['Libro', 'Autor', 'Genero', 'Prestamo', 'PerfilUsuario', 'User']
         model_name = sender.__name__
         
-        if model_name not in important_models:
-            return
-        
         changes = {}
         if action == 'UPDATE':
-            try:
-                # Obtener el estado anterior si existe
-                if hasattr(instance, '_state') and instance._state.db:
-                    old_instance = sender.objects.get(pk=instance.pk)
-                    for field in instance._meta.fields:
-                        field_name = field.name
-                        old_value = getattr(old_instance, field_name)
-                        new_value = getattr(instance, field_name)
-                        if old_value != new_value:
-                            changes[field_name] = {
-                                'old': str(old_value),
-                                'new': str(new_value)
-                            }
-            except (sender.DoesNotExist, AttributeError):
-                pass
+            # Diff contra el snapshot tomado al cargar o guardar la instancia
+            changes = get_changes(instance, update_fields)
         elif action == 'CREATE':
             changes = {'created': True}
         elif action == 'DELETE':
             changes = {'deleted': True}
         
-        AuditLog.objects.create(
+        if action != 'DELETE':
+            take_snapshot(instance, update_fields)
+        
+        add_audit_log(AuditLog(
             user=getattr(instance, 'user', None) if hasattr(instance, 'user') else None,
             action=action,
             object_type=model_name,
             object_id=instance.pk,
             object_repr=str(instance)[:200],
             changes=changes
-        )
+        ))
     except Exception as e:
         logger.error(f"Error creating audit log: {e}")
 
-@receiver(post_save)
-def log_save(sender, instance, created, **kwargs):
+def log_save(sender, instance, created, update_fields=None, **kwargs):
     """Registrar cambios CREATE/UPDATE"""
     action = 'CREATE' if created else 'UPDATE'
-    create_audit_log(sender, instance, action)
+    create_audit_log(sender, instance, action, update_fields=update_fields)
 
-@receiver(post_delete)
 def log_delete(sender, instance, **kwargs):
     """Registrar eliminaciones DELETE"""
-    create_audit_log(sender, instance, 'DELETE')
\ No newline at end of file
+    create_audit_log(sender, instance, 'DELETE')
+
+# Conectar los receptores solo a los modelos auditados: el resto de modelos
+# (incluido AuditLog) conserva el borrado rápido sin cargar las filas
+for model_label in AUDITED_MODELS:
+    post_save.connect(log_save, sender=model_label, dispatch_uid=f'audit_save_{model_label}')
+    post_delete.connect(log_delete, sender=model_label, dispatch_uid=f'audit_delete_{model_label}')
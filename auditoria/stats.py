@@ -0,0 +1,166 @@
+"""Estadísticas de auditoría calculadas con consultas agrupadas.
+
+Con ``bucket=day`` los días ya resumidos se leen de AuditDailyRollup y solo
+los logs posteriores a la marca de agua (normalmente los del día en curso)
+se agregan en vivo sobre AuditLog.
+
+``total_logs`` tampoco recorre AuditLog: es la suma de AuditDailyRollup más
+los logs posteriores a la marca de agua (un rango de la clave primaria). Los
+días ya archivados siguen contando mientras conserven su resumen.
+"""
+from collections import Counter
+from datetime import datetime, time, timedelta
+
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate, TruncDay, TruncHour
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+DEFAULT_WINDOW_DAYS = 30
+MAX_WINDOW_DAYS = 366
+DEFAULT_TOP = 10
+MAX_TOP = 100
+
+BUCKETS = {
+    'day': TruncDay,
+    'hour': TruncHour,
+}
+
+
+def _int_param(params, name, default, maximum):
+    value = params.get(name)
+    if value in (None, ''):
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise ValidationError({name: 'Debe ser un número entero'})
+    if not 1 <= value <= maximum:
+        raise ValidationError({name: f'Debe estar entre 1 y {maximum}'})
+    return value
+
+
+def parse_options(params):
+    """Leer ``days``, ``bucket`` y ``top`` de los parámetros de la petición"""
+    bucket = params.get('bucket', 'day')
+    if bucket not in BUCKETS:
+        raise ValidationError({'bucket': f'Debe ser uno de: {", ".join(BUCKETS)}'})
+    return {
+        'days': _int_param(params, 'days', DEFAULT_WINDOW_DAYS, MAX_WINDOW_DAYS),
+        'bucket': bucket,
+        'top': _int_param(params, 'top', DEFAULT_TOP, MAX_TOP),
+    }
+
+
+def compute_statistics(queryset, days=DEFAULT_WINDOW_DAYS, bucket='day', top=DEFAULT_TOP, owner=None):
+    """Estadísticas de la ventana; ``owner`` limita el resumen a un usuario"""
+    if bucket == 'day':
+        return _rollup_statistics(queryset, days, top, owner)
+    return _live_statistics(queryset, days, bucket, top, owner)
+
+
+def _total_logs(queryset, owner, watermark):
+    """Total del resumen diario más los logs posteriores a la marca de agua"""
+    from .models import AuditDailyRollup
+
+    summarized = AuditDailyRollup.objects.all()
+    if owner is not None:
+        summarized = summarized.filter(user=owner)
+    total = summarized.aggregate(total=Sum('count'))['total'] or 0
+    return total + queryset.filter(id__gt=watermark).order_by().count()
+
+
+def _rollup_statistics(queryset, days, top, owner):
+    """Combinar el resumen diario con los logs posteriores a la marca de agua"""
+    from .models import AuditDailyRollup, AuditLog, AuditRollupWatermark
+
+    # La ventana se redondea al inicio del primer día
+    since_date = timezone.localdate(timezone.now() - timedelta(days=days))
+    since = timezone.make_aware(datetime.combine(since_date, time.min))
+    watermark = AuditRollupWatermark.current()
+
+    summarized = AuditDailyRollup.objects.filter(date__gte=since_date)
+    if owner is not None:
+        summarized = summarized.filter(user=owner)
+    summarized = (
+        summarized.order_by()
+        .values('date', 'action', 'object_type', 'user__username')
+        .annotate(total=Sum('count'))
+    )
+    live = (
+        queryset.filter(id__gt=watermark, timestamp__gte=since).order_by()
+        .annotate(date=TruncDate('timestamp'))
+        .values('date', 'action', 'object_type', 'user__username')
+        .annotate(total=Count('id'))
+    )
+
+    actions, objects, users, timeline = Counter(), Counter(), Counter(), Counter()
+    for rows in (summarized, live):
+        for row in rows:
+            actions[row['action']] += row['total']
+            objects[row['object_type']] += row['total']
+            if row['user__username'] is not None:
+                users[row['user__username']] += row['total']
+            timeline[row['date']] += row['total']
+
+    action_labels = dict(AuditLog.ACTION_CHOICES)
+    return {
+        'total_logs': _total_logs(queryset, owner, watermark),
+        'recent_logs': sum(actions.values()),
+        'window_days': days,
+        'bucket': 'day',
+        'actions_by_type': {
+            action_labels.get(action, action): total for action, total in actions.most_common()
+        },
+        'objects_by_type': dict(objects.most_common()),
+        'top_users': dict(users.most_common(top)),
+        'timeline': [
+            {
+                'bucket': timezone.make_aware(datetime.combine(date, time.min)).isoformat(),
+                'count': timeline[date]
+            }
+            for date in sorted(timeline)
+        ],
+    }
+
+
+def _live_statistics(queryset, days, bucket, top, owner):
+    """Agregar los logs de la ventana con una consulta por dimensión"""
+    from .models import AuditLog, AuditRollupWatermark
+
+    since = timezone.now() - timedelta(days=days)
+    recent_logs = queryset.filter(timestamp__gte=since).order_by()
+
+    action_labels = dict(AuditLog.ACTION_CHOICES)
+    actions_by_type = {}
+    for row in recent_logs.values('action').annotate(total=Count('id')).order_by('-total'):
+        label = action_labels.get(row['action'], row['action'])
+        actions_by_type[label] = row['total']
+
+    objects_by_type = {
+        row['object_type']: row['total']
+        for row in recent_logs.values('object_type').annotate(total=Count('id')).order_by('-total')
+    }
+
+    top_users = {
+        row['user__username']: row['total']
+        for row in recent_logs.filter(user__isnull=False)
+        .values('user__username').annotate(total=Count('id')).order_by('-total')[:top]
+    }
+
+    timeline = [
+        {'bucket': row['bucket'].isoformat(), 'count': row['total']}
+        for row in recent_logs.annotate(bucket=BUCKETS[bucket]('timestamp'))
+        .values('bucket').annotate(total=Count('id')).order_by('bucket')
+    ]
+
+    return {
+        'total_logs': _total_logs(queryset, owner, AuditRollupWatermark.current()),
+        'recent_logs': sum(actions_by_type.values()),
+        'window_days': days,
+        'bucket': bucket,
+        'actions_by_type': actions_by_type,
+        'objects_by_type': objects_by_type,
+        'top_users': top_users,
+        'timeline': timeline,
+    }
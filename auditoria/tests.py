@@ -0,0 +1,395 @@
+import csv
+import gzip
+import io
+import json
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock, skipUnless
+import openpyxl
+import pytest
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from libros.models import Autor, Libro
+from usuarios.models import PerfilUsuario
+from .archive import archive_logs
+from .buffer import audit_buffer
+from .exports import XLSX_CONTENT_TYPE
+from .models import AuditDailyRollup, AuditLog, AuditRollupWatermark
+from .rollup import refresh_rollup
+
+@pytest.mark.django_db
+class TestSeguimientoCambios(TestCase):
+    """Pruebas del cálculo de diffs de auditoría en memoria"""
+
+    def setUp(self):
+        self.autor = Autor.objects.create(nombre='Gabriel', apellido='García Márquez')
+        self.libro = Libro.objects.create(
+            titulo='Cien años de soledad',
+            autor=self.autor,
+            isbn='9780307350454',
+            anio_publicacion=1967
+        )
+
+    def test_actualizacion_registra_valores_anteriores(self):
+        """Test: El diff de UPDATE contiene el valor anterior y el nuevo"""
+        libro = Libro.objects.get(pk=self.libro.pk)
+        libro.titulo = 'Cien años de soledad (Edición Especial)'
+        with self.captureOnCommitCallbacks(execute=True):
+            libro.save()
+
+        log = AuditLog.objects.filter(action='UPDATE', object_type='Libro').latest('id')
+        self.assertEqual(log.changes['titulo']['old'], 'Cien años de soledad')
+        self.assertEqual(log.changes['titulo']['new'], 'Cien años de soledad (Edición Especial)')
+        self.assertNotIn('isbn', log.changes)
+
+    def test_actualizacion_no_consulta_estado_anterior(self):
+        """Test: Guardar un modelo auditado no hace un SELECT adicional"""
+        libro = Libro.objects.get(pk=self.libro.pk)
+        libro.estado = 'mantenimiento'
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks(execute=True):
+                libro.save()
+
+        lecturas = [q['sql'] for q in queries if q['sql'].startswith('SELECT') and 'FROM "libros_libro"' in q['sql']]
+        self.assertEqual(lecturas, [])
+
+    def test_guardados_consecutivos_usan_ultimo_snapshot(self):
+        """Test: Cada guardado parte de los valores del guardado anterior"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.libro.estado = 'prestado'
+            self.libro.save()
+            self.libro.estado = 'disponible'
+            self.libro.save()
+
+        log = AuditLog.objects.filter(action='UPDATE', object_type='Libro').latest('id')
+        self.assertEqual(log.changes['estado'], {'old': 'prestado', 'new': 'disponible'})
+
+    def test_update_fields_limita_el_diff(self):
+        """Test: Con update_fields solo se reportan los campos guardados"""
+        self.libro.titulo = 'Otro título'
+        self.libro.estado = 'baja'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.libro.save(update_fields=['estado'])
+
+        log = AuditLog.objects.filter(action='UPDATE', object_type='Libro').latest('id')
+        self.assertIn('estado', log.changes)
+        self.assertNotIn('titulo', log.changes)
+
+
+@pytest.mark.django_db
+class TestBufferAuditoria(TestCase):
+    """Pruebas del buffer de escritura de logs de auditoría"""
+
+    def setUp(self):
+        self.autor = Autor.objects.create(nombre='Julio', apellido='Cortázar')
+
+    def test_buffer_escribe_en_un_solo_insert(self):
+        """Test: Los logs de un ámbito de buffer se escriben juntos"""
+        with audit_buffer() as buffer:
+            with self.captureOnCommitCallbacks(execute=True):
+                for i in range(5):
+                    self.autor.nombre = f'Julio {i}'
+                    self.autor.save()
+            self.assertEqual(len(buffer.entries), 5)
+            with self.assertNumQueries(1):
+                buffer.flush()
+
+        self.assertEqual(AuditLog.objects.filter(object_type='Autor', action='UPDATE').count(), 5)
+
+    def test_buffer_vuelca_al_alcanzar_el_limite(self):
+        """Test: El buffer se vuelca al llegar a max_size"""
+        with audit_buffer(max_size=2) as buffer:
+            with self.captureOnCommitCallbacks(execute=True):
+                for i in range(3):
+                    self.autor.nombre = f'Julio {i}'
+                    self.autor.save()
+            self.assertEqual(len(buffer.entries), 1)
+
+        self.assertEqual(AuditLog.objects.filter(object_type='Autor', action='UPDATE').count(), 3)
+
+    def test_transaccion_revertida_no_genera_logs(self):
+        """Test: El trabajo revertido no deja logs de auditoría"""
+        initial_logs = AuditLog.objects.count()
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    Autor.objects.create(nombre='Jorge Luis', apellido='Borges')
+                    raise RuntimeError('rollback')
+            except RuntimeError:
+                pass
+
+        self.assertEqual(AuditLog.objects.count(), initial_logs)
+
+
+@pytest.mark.django_db
+class TestExportacionAuditoria(APITestCase):
+    """Pruebas de la exportación de logs de auditoría"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='bibliotecario', password='testpass123')
+        PerfilUsuario.objects.create(user=self.user, tipo_usuario='bibliotecario')
+        self.client.force_authenticate(self.user)
+        AuditLog.objects.bulk_create([
+            AuditLog(user=self.user, action='CREATE', object_type='Libro', object_id=i,
+                     object_repr=f'Libro {i}')
+            for i in range(25)
+        ])
+
+    def test_exportacion_excel_en_streaming(self):
+        """Test: La exportación a Excel se emite en streaming y contiene todas las filas"""
+        response = self.client.get('/api/auditoria/logs/export_excel/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], XLSX_CONTENT_TYPE)
+
+        workbook = openpyxl.load_workbook(io.BytesIO(b''.join(response.streaming_content)))
+        sheet = workbook.active
+        self.assertEqual(sheet.max_row, 1 + AuditLog.objects.count())
+        self.assertEqual(sheet['A1'].value, 'Fecha')
+
+    def test_exportacion_csv_con_filtros(self):
+        """Test: Exportar a CSV aplica los filtros de acción y tipo de objeto"""
+        AuditLog.objects.create(user=self.user, action='DELETE', object_type='Autor', object_id=1)
+
+        response = self.client.get('/api/auditoria/logs/export/', {
+            'format': 'csv', 'action': 'delete', 'object_type': 'Autor'
+        })
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode('utf-8'))))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['action'], 'DELETE')
+        self.assertEqual(rows[0]['username'], 'bibliotecario')
+
+    def test_exportacion_ndjson_gzip_por_bloques(self):
+        """Test: Exportar a NDJSON comprimido recorre todos los bloques del cursor"""
+        with mock.patch('auditoria.exports.EXPORT_CHUNK_SIZE', 10):
+            response = self.client.get('/api/auditoria/logs/export/', {'format': 'ndjson.gz'})
+            content = b''.join(response.streaming_content)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        records = [json.loads(line) for line in gzip.decompress(content).splitlines()]
+        self.assertEqual(len(records), 25)
+        self.assertEqual(len({record['id'] for record in records}), 25)
+
+    def test_exportacion_rango_de_fechas(self):
+        """Test: Los filtros from/to limitan el rango exportado"""
+        AuditLog.objects.filter(object_id__lt=5).update(timestamp=timezone.now() - timedelta(days=40))
+        desde = (timezone.localdate() - timedelta(days=30)).isoformat()
+
+        response = self.client.get('/api/auditoria/logs/export/', {'format': 'ndjson.gz', 'from': desde})
+        records = gzip.decompress(b''.join(response.streaming_content)).splitlines()
+        self.assertEqual(len(records), 20)
+
+        response = self.client.get('/api/auditoria/logs/export/', {'format': 'csv', 'from': 'ayer'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_listado_paginado_por_cursor(self):
+        """Test: El listado de logs usa paginación por cursor"""
+        response = self.client.get('/api/auditoria/logs/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('count', response.data)
+        self.assertEqual(len(response.data['results']), 20)
+        self.assertEqual(response.data['results'][0]['username'], 'bibliotecario')
+        self.assertIsNotNone(response.data['next'])
+
+
+@pytest.mark.django_db
+class TestEstadisticasAuditoria(APITestCase):
+    """Pruebas de las estadísticas de auditoría"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='dba', password='testpass123')
+        PerfilUsuario.objects.create(user=self.user, tipo_usuario='dba')
+        self.client.force_authenticate(self.user)
+
+    def crear_logs(self, cantidad):
+        AuditLog.objects.bulk_create([
+            AuditLog(user=self.user, action='CREATE' if i % 2 else 'UPDATE',
+                     object_type='Libro' if i % 3 else 'Autor', object_id=i)
+            for i in range(cantidad)
+        ])
+
+    def test_estadisticas_agrupadas(self):
+        """Test: Los conteos por acción, objeto y usuario vienen de la base de datos"""
+        self.crear_logs(12)
+        AuditLog.objects.create(action='DELETE', object_type='Libro',
+                                timestamp=timezone.now() - timedelta(days=45))
+
+        response = self.client.get('/api/auditoria/logs/statistics/', {'bucket': 'hour', 'top': 1})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_logs'], AuditLog.objects.count())
+        self.assertEqual(response.data['recent_logs'], 12)
+        self.assertEqual(response.data['actions_by_type'], {'Creación': 6, 'Actualización': 6})
+        self.assertEqual(response.data['objects_by_type'], {'Libro': 8, 'Autor': 4})
+        self.assertEqual(response.data['top_users'], {'dba': 12})
+        self.assertEqual(sum(row['count'] for row in response.data['timeline']), 12)
+
+    def test_consultas_independientes_del_volumen(self):
+        """Test: El número de consultas no depende de la cantidad de logs"""
+        self.crear_logs(5)
+        with CaptureQueriesContext(connection) as pocos:
+            self.client.get('/api/auditoria/logs/statistics/')
+        self.crear_logs(50)
+        with CaptureQueriesContext(connection) as muchos:
+            self.client.get('/api/auditoria/logs/statistics/')
+
+        self.assertEqual(len(pocos), len(muchos))
+
+    def test_parametros_invalidos(self):
+        """Test: Parámetros inválidos devuelven 400"""
+        response = self.client.get('/api/auditoria/logs/statistics/', {'bucket': 'week'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get('/api/auditoria/logs/statistics/', {'days': '0'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_resumen_diario_combinado_con_logs_recientes(self):
+        """Test: Las estadísticas diarias suman el resumen y los logs nuevos"""
+        self.crear_logs(6)
+        AuditLog.objects.update(timestamp=timezone.now() - timedelta(days=2))
+        call_command('refresh_audit_rollup', stdout=io.StringIO())
+        self.assertEqual(AuditRollupWatermark.current(), AuditLog.objects.latest('id').id)
+        self.assertEqual(sum(AuditDailyRollup.objects.values_list('count', flat=True)), 6)
+
+        # Logs posteriores a la marca de agua se cuentan en vivo
+        self.crear_logs(4)
+        response = self.client.get('/api/auditoria/logs/statistics/')
+
+        self.assertEqual(response.data['recent_logs'], 10)
+        self.assertEqual(response.data['actions_by_type'], {'Creación': 5, 'Actualización': 5})
+        self.assertEqual(response.data['top_users'], {'dba': 10})
+        self.assertEqual(len(response.data['timeline']), 2)
+
+    def test_total_sin_recorrer_la_tabla(self):
+        """Test: El total suma el resumen y solo cuenta los logs posteriores a la marca de agua"""
+        self.crear_logs(6)
+        AuditLog.objects.update(timestamp=timezone.now() - timedelta(days=2))
+        refresh_rollup()
+        self.crear_logs(4)
+
+        for bucket in ['day', 'hour']:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get('/api/auditoria/logs/statistics/', {'bucket': bucket})
+            self.assertEqual(response.data['total_logs'], 10)
+            for query in queries.captured_queries:
+                if 'COUNT(*)' in query['sql'] and '"auditoria_auditlog"' in query['sql']:
+                    self.assertIn('"auditoria_auditlog"."id" >', query['sql'])
+
+    def test_actualizacion_incremental_del_resumen(self):
+        """Test: Cada actualización solo suma los logs nuevos"""
+        self.crear_logs(3)
+        AuditLog.objects.update(timestamp=timezone.now() - timedelta(days=1))
+        refresh_rollup()
+        self.assertEqual(refresh_rollup(), [])
+
+        self.crear_logs(3)
+        AuditLog.objects.filter(id__gt=AuditRollupWatermark.current()).update(
+            timestamp=timezone.now() - timedelta(days=1)
+        )
+        days = refresh_rollup()
+
+        self.assertEqual(len(days), 1)
+        self.assertEqual(sum(AuditDailyRollup.objects.values_list('count', flat=True)), 6)
+        # Los conteos nuevos se suman a las mismas filas del día
+        self.assertEqual(AuditDailyRollup.objects.count(), 3)
+
+
+@pytest.mark.django_db
+@skipUnless(connection.vendor == 'sqlite', 'Usa EXPLAIN QUERY PLAN de SQLite')
+class TestIndicesAuditoria(TestCase):
+    """Pruebas de que las consultas frecuentes sobre AuditLog usan índices"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='lector', password='testpass123')
+        self.desde = timezone.now() - timedelta(days=30)
+
+    def assertUsaIndice(self, queryset, indice):
+        plan = queryset.explain()
+        self.assertRegex(plan, rf'USING (COVERING )?INDEX {indice}\b', plan)
+
+    def test_historial_por_usuario(self):
+        """Test: El historial de un usuario usa (user, -timestamp)"""
+        queryset = AuditLog.objects.filter(user=self.user).order_by('-timestamp')
+        self.assertUsaIndice(queryset, 'auditlog_user_ts_idx')
+        self.assertNotIn('TEMP B-TREE', queryset.explain())
+
+    def test_listado_ordenado_por_fecha(self):
+        """Test: El listado general recorre el índice de timestamp sin ordenar"""
+        queryset = AuditLog.objects.order_by('-timestamp')
+        self.assertUsaIndice(queryset, 'auditlog_ts_idx')
+        self.assertNotIn('TEMP B-TREE', queryset.explain())
+
+    def test_rango_de_fechas(self):
+        """Test: Las estadísticas por ventana de tiempo usan el índice de timestamp"""
+        queryset = AuditLog.objects.filter(timestamp__gte=self.desde).values('object_type').order_by()
+        self.assertUsaIndice(queryset, 'auditlog_ts_idx')
+
+    def test_total_tras_la_marca_de_agua(self):
+        """Test: El total de las estadísticas busca por rango de la clave primaria"""
+        plan = AuditLog.objects.filter(id__gt=100).order_by().explain()
+        self.assertNotRegex(plan, r'SCAN (TABLE )?auditoria_auditlog\b', plan)
+
+    def test_historial_de_objeto(self):
+        """Test: El historial de un objeto usa (object_type, object_id)"""
+        queryset = AuditLog.objects.filter(object_type='Libro', object_id=1)
+        self.assertUsaIndice(queryset, 'auditlog_object_idx')
+
+    def test_filtro_por_accion(self):
+        """Test: El filtro por acción y fecha usa (action, timestamp)"""
+        queryset = AuditLog.objects.filter(action='CREATE', timestamp__gte=self.desde)
+        self.assertUsaIndice(queryset, 'auditlog_action_ts_idx')
+
+
+@pytest.mark.django_db
+class TestArchivoAuditoria(APITestCase):
+    """Pruebas de la retención y el archivo mensual de logs"""
+
+    def setUp(self):
+        self.archive_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.archive_dir.cleanup)
+        override = override_settings(AUDIT_ARCHIVE_DIR=Path(self.archive_dir.name))
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.user = User.objects.create_user(username='dba', password='testpass123')
+        PerfilUsuario.objects.create(user=self.user, tipo_usuario='dba')
+        self.client.force_authenticate(self.user)
+
+        self.antiguo = timezone.now() - timedelta(days=400)
+        AuditLog.objects.bulk_create([
+            AuditLog(user=self.user, action='CREATE', object_type='Libro', object_id=i,
+                     timestamp=self.antiguo + timedelta(days=i * 15))
+            for i in range(3)
+        ] + [AuditLog(user=self.user, action='UPDATE', object_type='Libro', object_id=99)])
+
+    def test_archivar_mueve_logs_antiguos(self):
+        """Test: Los logs fuera de la retención se archivan y se borran por bloques"""
+        call_command('archive_audit_logs', '--days', '365', '--chunk-size', '2', stdout=io.StringIO())
+
+        self.assertEqual(list(AuditLog.objects.values_list('object_id', flat=True)), [99])
+        segmentos = sorted(Path(self.archive_dir.name).glob('*.ndjson.gz'))
+        self.assertGreaterEqual(len(segmentos), 2)
+        # El resumen diario conserva los conteos de lo archivado
+        self.assertEqual(sum(AuditDailyRollup.objects.values_list('count', flat=True)), 3)
+
+    def test_consultar_archivo_por_rango(self):
+        """Test: El endpoint de archivo devuelve los logs del rango pedido"""
+        archive_logs(days=365)
+        desde = (self.antiguo + timedelta(days=10)).date().isoformat()
+
+        response = self.client.get('/api/auditoria/logs/archive/', {'from': desde})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        records = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(sorted(record['object_id'] for record in records), [1, 2])
+        self.assertEqual(records[0]['username'], 'dba')
@@ -0,0 +1,63 @@
+"""Seguimiento en memoria de los valores de los modelos auditados.
+
+Cada instancia guarda una copia de sus campos al cargarse desde la base de
+datos (``post_init``, que ``Model.from_db`` dispara) y después de cada
+guardado, de modo que el diff de una actualización se calcula sin volver a
+consultar la fila.
+"""
+from django.db.models.signals import post_init
+
+SNAPSHOT_ATTR = '_audit_snapshot'
+
+
+def _selected_fields(instance, fields=None):
+    for field in instance._meta.concrete_fields:
+        if fields is None or field.name in fields or field.attname in fields:
+            yield field
+
+
+def take_snapshot(instance, fields=None):
+    """Guardar los valores actuales de la instancia (o solo de ``fields``)"""
+    snapshot = getattr(instance, SNAPSHOT_ATTR, None)
+    if fields is None or snapshot is None:
+        snapshot = {}
+    # Leer de __dict__ evita disparar consultas para campos diferidos (only/defer)
+    values = instance.__dict__
+    for field in _selected_fields(instance, fields):
+        if field.attname in values:
+            snapshot[field.attname] = values[field.attname]
+    setattr(instance, SNAPSHOT_ATTR, snapshot)
+
+
+def get_changes(instance, fields=None):
+    """Comparar la instancia con su último snapshot y devolver los cambios"""
+    snapshot = getattr(instance, SNAPSHOT_ATTR, None)
+    if snapshot is None:
+        return {}
+
+    changes = {}
+    values = instance.__dict__
+    for field in _selected_fields(instance, fields):
+        if field.attname not in snapshot or field.attname not in values:
+            continue
+        old_value = snapshot[field.attname]
+        new_value = values[field.attname]
+        if old_value != new_value:
+            changes[field.name] = {
+                'old': str(old_value),
+                'new': str(new_value)
+            }
+    return changes
+
+
+def snapshot_on_init(sender, instance, **kwargs):
+    take_snapshot(instance)
+
+
+def track(model_label):
+    """Registrar un modelo (``'app_label.Modelo'``) para el seguimiento"""
+    post_init.connect(
+        snapshot_on_init,
+        sender=model_label,
+        dispatch_uid=f'audit_snapshot_{model_label}'
+    )
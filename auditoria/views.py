@@ -2,132 +2,130 @@ from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from django.http import HttpResponse
+from rest_framework.negotiation import DefaultContentNegotiation
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
 from django.utils import timezone
-from datetime import datetime, timedelta
+from datetime import datetime
+from libreria_api.pagination import CursorOrPageNumberPagination
+from .archive import read_archive
+from .exports import (
+    CSV_CONTENT_TYPE, NDJSON_GZ_CONTENT_TYPE, XLSX_CONTENT_TYPE,
+    filter_logs, iter_keyset, parse_boundary, stream_csv, stream_ndjson_gz, stream_xlsx
+)
 from .models import AuditLog
-import openpyxl
-from openpyxl.styles import Font, PatternFill, Alignment
+from .serializers import AuditLogSerializer
+from .stats import compute_statistics, parse_options
+import json
 import logging
 
 audit_logger = logging.getLogger('audit')
 
+class ExportContentNegotiation(DefaultContentNegotiation):
+    """En las exportaciones ?format= elige el formato del archivo, no el renderer"""
+    
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
 class AuditLogViewSet(viewsets.ModelViewSet):
-    queryset = AuditLog.objects.all()
+    queryset = AuditLog.objects.select_related('user')
+    serializer_class = AuditLogSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = CursorOrPageNumberPagination
+    cursor_ordering = ['-timestamp', '-id']
     
     def get_queryset(self):
         user = self.request.user
+        queryset = super().get_queryset()
         if user.perfil.tipo_usuario in ['bibliotecario', 'dba']:
-            return AuditLog.objects.all()
-        return AuditLog.objects.filter(user=user)
+            return queryset
+        return queryset.filter(user=user)
     
     @action(detail=False, methods=['get'])
     def export_excel(self, request):
         """Exportar logs de auditoría a Excel"""
-        queryset = self.get_queryset()
-        
-        # Crear libro Excel
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Logs de Auditoría"
-        
-        # Encabezados
-        headers = ['Fecha', 'Usuario', 'Acción', 'Tipo Objeto', 'ID Objeto', 'Objeto', 'Cambios', 'IP']
-        ws.append(headers)
-        
-        # Estilos para encabezados
-        header_font = Font(bold=True, color='FFFFFF')
-        header_fill = PatternFill(start_color='366092', end_color='366092', fill_type='solid')
-        header_alignment = Alignment(horizontal='center')
-        
-        for cell in ws[1]:
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = header_alignment
-        
-        # Datos
-        for log in queryset:
-            row = [
-                log.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-                log.user.username if log.user else 'N/A',
-                log.get_action_display(),
-                log.object_type,
-                log.object_id or '',
-                log.object_repr,
-                str(log.changes),
-                log.ip_address or ''
-            ]
-            ws.append(row)
-        
-        # Autoajustar columnas
-        for column in ws.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            ws.column_dimensions[column_letter].width = adjusted_width
+        queryset = filter_logs(self.get_queryset(), request.query_params)
+        username = request.user.username
+        
+        def log_export(rows):
+            # Log de exportación
+            audit_logger.info(
+                f'export_excel',
+                extra={
+                    'user': username,
+                    'action': 'EXPORT',
+                    'object_type': 'AuditLog',
+                    'changes': {'exported_records': rows}
+                }
+            )
         
-        # Guardar en memoria
-        response = HttpResponse(
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        response = StreamingHttpResponse(
+            stream_xlsx(queryset, on_complete=log_export),
+            content_type=XLSX_CONTENT_TYPE
         )
         response['Content-Disposition'] = f'attachment; filename=audit_logs_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
+        return response
+    
+    @action(detail=False, methods=['get'], content_negotiation_class=ExportContentNegotiation)
+    def export(self, request):
+        """Exportar logs de auditoría (?format=csv|ndjson.gz en streaming, o xlsx)"""
+        export_format = request.query_params.get('format', 'csv')
+        if export_format == 'xlsx':
+            return self.export_excel(request)
+        
+        formats = {
+            'csv': (stream_csv, CSV_CONTENT_TYPE),
+            'ndjson.gz': (stream_ndjson_gz, NDJSON_GZ_CONTENT_TYPE),
+        }
+        if export_format not in formats:
+            return Response({'error': f'Formato no soportado: {export_format}'}, status=status.HTTP_400_BAD_REQUEST)
         
-        wb.save(response)
+        stream, content_type = formats[export_format]
+        queryset = filter_logs(self.get_queryset(), request.query_params)
+        
+        response = StreamingHttpResponse(stream(iter_keyset(queryset)), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename=audit_logs_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{export_format}'
         
-        # Log de exportación
         audit_logger.info(
-            f'export_excel',
+            f'export_{export_format}',
             extra={
                 'user': request.user.username,
                 'action': 'EXPORT',
                 'object_type': 'AuditLog',
-                'changes': {'exported_records': queryset.count()}
+                'changes': dict(request.query_params.items())
             }
         )
-        
         return response
     
+    @action(detail=False, methods=['get'])
+    def archive(self, request):
+        """Consultar logs archivados por rango de fechas (?from=&to=), en NDJSON"""
+        if not request.query_params.get('from'):
+            return Response({'error': 'El parámetro from es obligatorio'}, status=status.HTTP_400_BAD_REQUEST)
+        start = parse_boundary(request.query_params['from'], 'from')
+        end = timezone.now()
+        if request.query_params.get('to'):
+            end = parse_boundary(request.query_params['to'], 'to', end=True)
+        
+        user_id = None
+        if request.user.perfil.tipo_usuario not in ['bibliotecario', 'dba']:
+            user_id = request.user.pk
+        action_filter = request.query_params.get('action')
+        records = read_archive(
+            start, end,
+            user_id=user_id,
+            action=action_filter.upper() if action_filter else None,
+            object_type=request.query_params.get('object_type')
+        )
+        lines = (json.dumps(record, ensure_ascii=False, cls=DjangoJSONEncoder) + '\n' for record in records)
+        return StreamingHttpResponse(lines, content_type='application/x-ndjson')
+    
     @action(detail=False, methods=['get'])
     def statistics(self, request):
-        """Estadísticas de auditoría"""
-        queryset = self.get_queryset()
-        
-        # Últimos 30 días
-        thirty_days_ago = timezone.now() - timedelta(days=30)
-        recent_logs = queryset.filter(timestamp__gte=thirty_days_ago)
-        
-        stats = {
-            'total_logs': queryset.count(),
-            'recent_logs': recent_logs.count(),
-            'actions_by_type': {},
-            'objects_by_type': {},
-            'top_users': {}
-        }
-        
-        # Estadísticas por acción
-        for log in recent_logs:
-            action = log.get_action_display()
-            stats['actions_by_type'][action] = stats['actions_by_type'].get(action, 0) + 1
-        
-        # Estadísticas por tipo de objeto
-        for log in recent_logs:
-            obj_type = log.object_type
-            stats['objects_by_type'][obj_type] = stats['objects_by_type'].get(obj_type, 0) + 1
-        
-        # Usuarios más activos
-        for log in recent_logs:
-            if log.user:
-                username = log.user.username
-                stats['top_users'][username] = stats['top_users'].get(username, 0) + 1
-        
-        return Response(stats)
+        """Estadísticas de auditoría (?days=30&bucket=day|hour&top=10)"""
+        options = parse_options(request.query_params)
+        owner = None if request.user.perfil.tipo_usuario in ['bibliotecario', 'dba'] else request.user
+        return Response(compute_statistics(self.get_queryset(), owner=owner, **options))
 
 class LoginLogoutAPIView(APIView):
     """API para registrar inicios y cierres de sesión"""
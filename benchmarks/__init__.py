@@ -0,0 +1 @@
+"""Benchmarks de la API: siembra de datos (``seed``) y carga concurrente (``run``)."""
@@ -0,0 +1,58 @@
+"""Uso:
+
+    python -m benchmarks seed --scale full
+    python -m benchmarks run --iterations 500 --concurrency 8 --output resultados.json
+
+Usa la base de datos configurada (variables DB_*): apúntala a una base vacía
+dedicada, p. ej. ``DB_NAME=bench.sqlite3 python manage.py migrate``.
+"""
+import argparse
+import json
+import os
+import sys
+
+import django
+
+
+def main(argv=None):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'libreria_api.settings')
+    django.setup()
+    from .run import SCENARIOS, run_benchmarks
+    from .seed import DEFAULT_CHUNK_SIZE, SCALES, seed
+
+    parser = argparse.ArgumentParser(prog='python -m benchmarks')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    seed_parser = subparsers.add_parser('seed', help='Sembrar datos en una base vacía')
+    seed_parser.add_argument('--scale', choices=SCALES, default='small')
+    seed_parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    seed_parser.add_argument('--seed', type=int, default=1234)
+
+    run_parser = subparsers.add_parser('run', help='Ejecutar los escenarios y escribir el informe JSON')
+    run_parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                            help=f'Lista separada por comas ({", ".join(SCENARIOS)})')
+    run_parser.add_argument('--iterations', type=int, default=200)
+    run_parser.add_argument('--concurrency', type=int, default=8)
+    run_parser.add_argument('--seed', type=int, default=1234)
+    run_parser.add_argument('--output', help='Fichero de salida (por defecto, la salida estándar)')
+
+    args = parser.parse_args(argv)
+    if args.command == 'seed':
+        seed(SCALES[args.scale], chunk_size=args.chunk_size, seed=args.seed, stdout=sys.stdout)
+        return
+
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f'Escenarios desconocidos: {", ".join(sorted(unknown))}')
+    informe = run_benchmarks(scenarios, iterations=args.iterations, concurrency=args.concurrency, seed=args.seed)
+    salida = json.dumps(informe, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(salida + '\n')
+    else:
+        print(salida)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""Factorías de factory-boy para sembrar datos realistas.
+
+Se usan con ``build_batch`` (sin tocar la base de datos) y ``bulk_create``: las
+claves ajenas se pasan como ``*_id`` ya existentes, así que ninguna factoría
+crea objetos relacionados por su cuenta.
+"""
+from datetime import timedelta
+
+import factory
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.utils import timezone
+from factory.django import DjangoModelFactory
+from factory.random import randgen
+
+from auditoria.models import AuditLog
+from libros.models import Autor, Libro, Prestamo
+from usuarios.models import PerfilUsuario
+
+PASSWORD = 'bench-pass-123'
+# Un solo hash para todos: calcularlo por usuario dominaría la siembra
+PASSWORD_HASH = make_password(PASSWORD)
+
+USER_AGENTS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/129.0 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 14_6) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.6 Safari/605.1.15',
+    'Mozilla/5.0 (X11; Linux x86_64; rv:131.0) Gecko/20100101 Firefox/131.0',
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 17_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148',
+    'python-requests/2.32.3',
+]
+
+IDIOMAS = ['Español', 'Español', 'Español', 'Inglés', 'Francés', 'Portugués', 'Italiano', 'Alemán']
+
+
+class AutorFactory(DjangoModelFactory):
+    class Meta:
+        model = Autor
+
+    nombre = factory.Faker('first_name', locale='es_ES')
+    apellido = factory.Faker('last_name', locale='es_ES')
+    nacionalidad = factory.Faker('country', locale='es_ES')
+
+
+class UserFactory(DjangoModelFactory):
+    class Meta:
+        model = User
+
+    username = factory.Sequence(lambda n: f'lector{n}')
+    email = factory.LazyAttribute(lambda u: f'{u.username}@example.com')
+    password = PASSWORD_HASH
+
+
+class PerfilUsuarioFactory(DjangoModelFactory):
+    class Meta:
+        model = PerfilUsuario
+
+    tipo_usuario = factory.Iterator(['gratuito', 'gratuito', 'gratuito', 'premium'])
+    limite_prestamos = factory.LazyAttribute(lambda p: 10 if p.tipo_usuario == 'premium' else 3)
+
+
+class LibroFactory(DjangoModelFactory):
+    class Meta:
+        model = Libro
+
+    titulo = factory.Faker('sentence', nb_words=4, locale='es_ES')
+    isbn = factory.Sequence(lambda n: f'{n:013d}')
+    anio_publicacion = factory.Faker('random_int', min=1850, max=2026)
+    editorial = factory.Faker('company', locale='es_ES')
+    num_paginas = factory.Faker('random_int', min=80, max=1200)
+    idioma = factory.Faker('random_element', elements=IDIOMAS)
+    descripcion = factory.Faker('paragraph', nb_sentences=3, locale='es_ES')
+
+
+class PrestamoFactory(DjangoModelFactory):
+    class Meta:
+        model = Prestamo
+
+    estado = 'devuelto'
+    fecha_devolucion = factory.Faker('date_between', start_date='-3y', end_date='+30d')
+    fecha_devuelto = factory.LazyAttribute(
+        lambda p: timezone.now() - timedelta(days=1) if p.estado == 'devuelto' else None
+    )
+
+
+class AuditLogFactory(DjangoModelFactory):
+    """Se siembran decenas de millones: campos baratos en lugar de un proveedor Faker por fila"""
+
+    class Meta:
+        model = AuditLog
+
+    action = factory.Iterator([
+        'CREATE', 'UPDATE', 'PRESTAMO', 'DEVOLUCION', 'UPDATE', 'PRESTAMO', 'DEVOLUCION', 'LOGIN', 'LOGOUT',
+    ])
+    object_type = factory.Iterator(['Libro', 'Prestamo', 'Libro', 'Autor', 'Prestamo', 'PerfilUsuario', 'Libro'])
+    object_id = factory.LazyFunction(lambda: randgen.randint(1, 1_000_000))
+    object_repr = factory.LazyAttribute(lambda log: f'{log.object_type} #{log.object_id}')
+    timestamp = factory.LazyFunction(lambda: timezone.now() - timedelta(seconds=randgen.randint(0, 2 * 365 * 86400)))
+    ip_address = factory.LazyFunction(lambda: f'10.{randgen.randint(0, 255)}.{randgen.randint(0, 255)}.{randgen.randint(1, 254)}')
+    user_agent = factory.Iterator(USER_AGENTS)
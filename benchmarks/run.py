@@ -0,0 +1,211 @@
+"""Carga concurrente en proceso contra los endpoints principales.
+
+Cada escenario se ejecuta por separado con ``concurrency`` hilos, cada uno con
+su ``django.test.Client`` y su usuario, hasta completar ``iterations``
+peticiones. De cada petición se mide la latencia y las consultas SQL; el
+resultado es un JSON con p50/p95/p99, throughput y consultas por escenario,
+pensado para compararse entre commits.
+"""
+import math
+import platform
+import random
+import subprocess
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, connections
+from django.db.models import Max, Min
+from django.test import Client, override_settings
+from rest_framework.authtoken.models import Token
+
+from libreria_api.metrics import QueryCounter
+from libros.models import Genero, Libro
+from usuarios.models import PerfilUsuario
+
+from .factories import IDIOMAS, PASSWORD, PASSWORD_HASH
+
+SCENARIOS = ('catalogo_listado', 'catalogo_detalle', 'prestar', 'estadisticas', 'export_excel', 'login')
+
+
+def percentile(values, pct):
+    """Percentil por rango más cercano de una lista ordenada"""
+    if not values:
+        return None
+    return values[max(math.ceil(pct / 100 * len(values)) - 1, 0)]
+
+
+def ensure_bench_users(n):
+    """Bibliotecarios ``bench0..benchN`` con token, uno por hilo"""
+    users = []
+    for i in range(n):
+        user, _ = User.objects.get_or_create(username=f'bench{i}', defaults={'password': PASSWORD_HASH})
+        PerfilUsuario.objects.get_or_create(
+            user=user, defaults={'tipo_usuario': 'bibliotecario', 'limite_prestamos': 50}
+        )
+        token, _ = Token.objects.get_or_create(user=user)
+        users.append((user, token.key))
+    return users
+
+
+class Context:
+    """Datos compartidos por los hilos para elegir peticiones al azar"""
+
+    def __init__(self):
+        rango = Libro.objects.aggregate(min=Min('pk'), max=Max('pk'))
+        self.libro_min, self.libro_max = rango['min'] or 0, rango['max'] or 0
+        self.generos = list(Genero.objects.values_list('pk', flat=True))
+
+
+class Worker:
+    def __init__(self, user, token, context, rng):
+        self.user = user
+        self.context = context
+        self.rng = rng
+        self.client = Client(HTTP_AUTHORIZATION=f'Token {token}')
+        self.samples = defaultdict(list)
+
+    def request(self, name, method, path, data=None, expected=(200,)):
+        counter = QueryCounter()
+        started = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            if method == 'post':
+                response = self.client.post(path, data or {}, content_type='application/json')
+            else:
+                response = self.client.get(path, data or {})
+            if response.streaming:
+                for _ in response.streaming_content:
+                    pass
+        elapsed = time.perf_counter() - started
+        self.samples[name].append((elapsed, counter.count, response.status_code in expected))
+        return response
+
+    def libro_al_azar(self):
+        return self.rng.randint(self.context.libro_min, self.context.libro_max)
+
+    def catalogo_listado(self):
+        params = self.rng.choice([
+            {},
+            {'genero': self.rng.choice(self.context.generos)} if self.context.generos else {},
+            {'idioma': self.rng.choice(IDIOMAS)},
+            {'anio_desde': 1950, 'anio_hasta': 2000},
+        ])
+        self.request('catalogo_listado', 'get', '/api/libros/libros/', params)
+
+    def catalogo_detalle(self):
+        self.request('catalogo_detalle', 'get', f'/api/libros/libros/{self.libro_al_azar()}/', expected=(200, 404))
+
+    def prestar(self):
+        """Prestar un libro al azar y, si se consigue, devolverlo"""
+        libro = self.libro_al_azar()
+        response = self.request(
+            'prestar', 'post', f'/api/libros/libros/{libro}/prestar/',
+            {'libro': libro, 'fecha_devolucion': (date.today() + timedelta(days=14)).isoformat()},
+            expected=(201, 404, 409),
+        )
+        if response.status_code == 201:
+            self.request('devolver', 'post', f"/api/libros/prestamos/{response.json()['id']}/devolver/")
+
+    def estadisticas(self):
+        self.request('estadisticas', 'get', '/api/auditoria/logs/statistics/', {'days': 30})
+
+    def export_excel(self):
+        dia = (date.today() - timedelta(days=self.rng.randint(0, 700))).isoformat()
+        self.request('export_excel', 'get', '/api/auditoria/logs/export_excel/', {'from': dia, 'to': dia})
+
+    def login(self):
+        self.request('login', 'post', '/api/usuarios/users/login/',
+                     {'username': self.user.username, 'password': PASSWORD})
+
+
+def _run_worker(worker, scenario, iterations, close_connection):
+    try:
+        action = getattr(worker, scenario)
+        for _ in range(iterations):
+            action()
+    finally:
+        if close_connection:
+            connections.close_all()
+    return worker.samples
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2) if seconds is not None else None
+
+
+def _summary(samples, wall):
+    latencies = sorted(sample[0] for sample in samples)
+    queries = sorted(sample[1] for sample in samples)
+    return {
+        'peticiones': len(samples),
+        'errores': sum(1 for sample in samples if not sample[2]),
+        'throughput_rps': round(len(samples) / wall, 1) if wall else None,
+        'latencia_ms': {
+            'p50': _ms(percentile(latencies, 50)),
+            'p95': _ms(percentile(latencies, 95)),
+            'p99': _ms(percentile(latencies, 99)),
+            'max': _ms(latencies[-1] if latencies else None),
+        },
+        'consultas': {
+            'media': round(sum(queries) / len(queries), 2) if queries else None,
+            'p95': percentile(queries, 95),
+            'max': queries[-1] if queries else None,
+        },
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, cwd=settings.BASE_DIR
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run_benchmarks(scenarios=SCENARIOS, iterations=200, concurrency=8, seed=1234):
+    """Ejecutar los escenarios y devolver el informe como diccionario"""
+    users = ensure_bench_users(concurrency)
+    context = Context()
+    informe = {
+        'commit': _git_commit(),
+        'fecha': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'entorno': {
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'base_de_datos': connection.vendor,
+        },
+        'parametros': {'iteraciones': iterations, 'concurrencia': concurrency, 'semilla': seed},
+        'escenarios': {},
+    }
+
+    # Sin DEBUG: Django no guarda las consultas ejecutadas en memoria
+    with override_settings(DEBUG=False, ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+        for scenario in scenarios:
+            workers = [
+                Worker(user, token, context, random.Random(f'{seed}-{scenario}-{i}'))
+                for i, (user, token) in enumerate(users)
+            ]
+            per_worker = [iterations // concurrency + (i < iterations % concurrency) for i in range(concurrency)]
+            started = time.perf_counter()
+            if concurrency == 1:
+                # En el hilo actual: ve los datos de una transacción abierta (pruebas)
+                results = [_run_worker(workers[0], scenario, per_worker[0], close_connection=False)]
+            else:
+                with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                    results = list(executor.map(
+                        _run_worker, workers, [scenario] * concurrency, per_worker, [True] * concurrency
+                    ))
+            wall = time.perf_counter() - started
+
+            merged = defaultdict(list)
+            for samples in results:
+                for name, values in samples.items():
+                    merged[name].extend(values)
+            for name, values in merged.items():
+                informe['escenarios'][name] = _summary(values, wall)
+    return informe
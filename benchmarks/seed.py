@@ -0,0 +1,151 @@
+"""Siembra reproducible de volúmenes grandes para los benchmarks.
+
+Los objetos se construyen con las factorías (``build_batch``) y se insertan por
+bloques con ``bulk_create``, cada bloque en su transacción. Con la misma semilla
+se generan los mismos datos. Al terminar se reconstruyen lo que ``bulk_create``
+no mantiene: índice de búsqueda, contadores de préstamos activos, resumen
+diario de auditoría y versiones de la caché del catálogo.
+"""
+import random
+import time
+from datetime import date, timedelta
+
+import factory.random
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import transaction
+from django.utils import timezone
+
+from auditoria.models import AuditLog
+from libros.caching import bump_version
+from libros.models import Autor, Genero, Libro, Prestamo
+from libros.search import index_libros
+from usuarios.models import PerfilUsuario
+
+from .factories import (
+    AuditLogFactory, AutorFactory, LibroFactory, PerfilUsuarioFactory, PrestamoFactory, UserFactory,
+)
+
+SCALES = {
+    'full': {'autores': 50_000, 'usuarios': 10_000, 'libros': 1_000_000,
+             'prestamos': 5_000_000, 'audit_logs': 20_000_000},
+    'medium': {'autores': 5_000, 'usuarios': 1_000, 'libros': 100_000,
+               'prestamos': 500_000, 'audit_logs': 2_000_000},
+    'small': {'autores': 500, 'usuarios': 200, 'libros': 10_000,
+              'prestamos': 50_000, 'audit_logs': 200_000},
+}
+
+GENEROS = [
+    'Novela', 'Cuento', 'Poesía', 'Ensayo', 'Teatro', 'Biografía', 'Historia', 'Ciencia ficción',
+    'Fantasía', 'Misterio', 'Romance', 'Infantil', 'Juvenil', 'Filosofía', 'Ciencia',
+    'Divulgación', 'Cómic', 'Viajes', 'Arte', 'Cocina',
+]
+
+DEFAULT_CHUNK_SIZE = 10_000
+
+# Proporción de libros con un préstamo abierto (activo o vencido)
+OPEN_RATIO = 0.05
+
+
+def _chunks(total, chunk_size):
+    for start in range(0, total, chunk_size):
+        yield min(chunk_size, total - start)
+
+
+class Seeder:
+    def __init__(self, counts, chunk_size=DEFAULT_CHUNK_SIZE, seed=1234, stdout=None):
+        self.counts = counts
+        self.chunk_size = chunk_size
+        self.rng = random.Random(seed)
+        self.stdout = stdout
+        factory.random.reseed_random(seed)
+
+    def log(self, message):
+        if self.stdout:
+            self.stdout.write(message + '\n')
+            self.stdout.flush()
+
+    def phase(self, name, total, insert_chunk):
+        started = time.monotonic()
+        for size in _chunks(total, self.chunk_size):
+            with transaction.atomic():
+                insert_chunk(size)
+        elapsed = time.monotonic() - started
+        self.log(f'{name}: {total} filas en {elapsed:.1f}s ({total / elapsed if elapsed else 0:.0f}/s)')
+
+    def run(self):
+        if Libro.objects.exists() or AuditLog.objects.exists():
+            raise ValueError('La base de datos ya tiene datos: usa una base vacía para los benchmarks')
+
+        Genero.objects.bulk_create([Genero(nombre=nombre) for nombre in GENEROS], ignore_conflicts=True)
+        self.generos = list(Genero.objects.values_list('pk', flat=True))
+
+        self.phase('autores', self.counts['autores'], self.insert_autores)
+        self.autores = list(Autor.objects.values_list('pk', flat=True))
+        self.phase('usuarios', self.counts['usuarios'], self.insert_usuarios)
+        self.usuarios = list(PerfilUsuario.objects.values_list('user_id', flat=True))
+        self.phase('libros', self.counts['libros'], self.insert_libros)
+        self.libros = list(Libro.objects.order_by('pk').values_list('pk', flat=True))
+        self.abiertos = self.libros[:min(int(len(self.libros) * OPEN_RATIO), self.counts['prestamos'])]
+        self.next_abierto = 0
+        self.phase('prestamos', self.counts['prestamos'], self.insert_prestamos)
+        self.phase('audit_logs', self.counts['audit_logs'], self.insert_audit_logs)
+
+        PerfilUsuario.reconciliar_prestamos_activos()
+        call_command('refresh_audit_rollup', stdout=self.stdout)
+        bump_version(Libro, Autor, Genero)
+
+    def insert_autores(self, size):
+        Autor.objects.bulk_create(AutorFactory.build_batch(size))
+
+    def insert_usuarios(self, size):
+        users = User.objects.bulk_create(UserFactory.build_batch(size))
+        if not all(user.pk for user in users):
+            # Motores sin RETURNING (MySQL): se leen los ids recién creados
+            users = User.objects.filter(username__in=[user.username for user in users])
+        PerfilUsuario.objects.bulk_create([PerfilUsuarioFactory.build(user_id=user.pk) for user in users])
+
+    def insert_libros(self, size):
+        libros = LibroFactory.build_batch(size)
+        for libro in libros:
+            libro.autor_id = self.rng.choice(self.autores)
+            libro.genero_id = self.rng.choice(self.generos)
+        Libro.objects.bulk_create(libros)
+        # bulk_create no envía señales: el índice de búsqueda se mantiene a mano
+        index_libros(Libro.objects.filter(isbn__in=[libro.isbn for libro in libros]).select_related('autor'))
+
+    def insert_prestamos(self, size):
+        today = date.today()
+        prestamos, prestados = [], []
+        for _ in range(size):
+            if self.next_abierto < len(self.abiertos):
+                # Un préstamo abierto por libro, y el libro pasa a 'prestado'
+                libro_id = self.abiertos[self.next_abierto]
+                self.next_abierto += 1
+                prestados.append(libro_id)
+                vencido = self.rng.random() < 0.2
+                prestamos.append(PrestamoFactory.build(
+                    libro_id=libro_id, usuario_id=self.rng.choice(self.usuarios),
+                    estado='vencido' if vencido else 'activo',
+                    fecha_devolucion=today + timedelta(days=self.rng.randint(-60, -1) if vencido
+                                                       else self.rng.randint(1, 30)),
+                ))
+            else:
+                prestamos.append(PrestamoFactory.build(
+                    libro_id=self.rng.choice(self.libros),
+                    usuario_id=self.rng.choice(self.usuarios),
+                ))
+        Prestamo.objects.bulk_create(prestamos)
+        if prestados:
+            Libro.objects.filter(pk__in=prestados).update(estado='prestado', fecha_actualizacion=timezone.now())
+
+    def insert_audit_logs(self, size):
+        logs = AuditLogFactory.build_batch(size)
+        for log in logs:
+            log.user_id = self.rng.choice(self.usuarios) if self.rng.random() < 0.9 else None
+        AuditLog.objects.bulk_create(logs)
+
+
+def seed(counts, chunk_size=DEFAULT_CHUNK_SIZE, seed=1234, stdout=None):
+    """Sembrar ``counts`` (autores, usuarios, libros, prestamos, audit_logs)"""
+    Seeder(counts, chunk_size=chunk_size, seed=seed, stdout=stdout).run()
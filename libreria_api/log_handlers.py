@@ -0,0 +1,108 @@
+"""Handlers de logging que no bloquean las peticiones.
+
+Los handlers de fichero encolan el registro en memoria y un hilo
+(``QueueListener``) lo formatea y lo escribe con rotación por tamaño o por
+tiempo. Si la cola se llena, el registro se descarta y se cuenta en
+``dropped`` en lugar de esperar al disco.
+"""
+import copy
+import json
+import logging
+import os
+import queue
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+from pathlib import Path
+
+DEFAULT_QUEUE_SIZE = 10000
+
+# Campos de los logs de auditoría; los que falten se escriben como null
+AUDIT_FIELDS = ('user', 'action', 'object_type', 'object_id', 'changes')
+
+
+class JsonAuditFormatter(logging.Formatter):
+    """Una línea JSON por registro, con los campos de auditoría si existen"""
+
+    def format(self, record):
+        data = {
+            'timestamp': datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for field in AUDIT_FIELDS:
+            data[field] = getattr(record, field, None)
+        if record.exc_info:
+            record.exc_text = record.exc_text or self.formatException(record.exc_info)
+        if record.exc_text:
+            data['exception'] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class _QueuedFileHandler(QueueHandler):
+    """Encola los registros; el fichero solo lo toca el hilo del listener"""
+
+    target_class = None
+
+    def __init__(self, filename, queue_size=DEFAULT_QUEUE_SIZE, **kwargs):
+        # El directorio se crea aquí: no hace falta que exista logs/ al arrancar
+        Path(filename).parent.mkdir(parents=True, exist_ok=True)
+        super().__init__(queue.Queue(queue_size))
+        self.target = self.target_class(filename, encoding='utf-8', delay=True, **kwargs)
+        self.dropped = 0
+        self.listener = None
+        self._pid = None
+        self._start()
+
+    def _start(self):
+        self.listener = QueueListener(self.queue, self.target)
+        self.listener.start()
+        self._pid = os.getpid()
+
+    def setFormatter(self, fmt):
+        # Se formatea en el hilo del listener, no en el de la petición
+        self.target.setFormatter(fmt)
+
+    def setLevel(self, level):
+        super().setLevel(level)
+        self.target.setLevel(level)
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            # No retener los frames de la excepción mientras espera en la cola
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def emit(self, record):
+        if self._pid != os.getpid():
+            # Proceso hijo tras un fork: el hilo del listener no existe aquí
+            self._start()
+        super().emit(record)
+
+    def close(self):
+        if self.listener is not None and self._pid == os.getpid():
+            # Vacía la cola antes de cerrar el fichero
+            self.listener.stop()
+            self.listener = None
+        self.target.close()
+        super().close()
+
+
+class QueueRotatingFileHandler(_QueuedFileHandler):
+    """Fichero rotado por tamaño (``maxBytes``, ``backupCount``)"""
+    target_class = RotatingFileHandler
+
+
+class QueueTimedRotatingFileHandler(_QueuedFileHandler):
+    """Fichero rotado por tiempo (``when``, ``interval``, ``backupCount``)"""
+    target_class = TimedRotatingFileHandler
@@ -0,0 +1,278 @@
+"""Métricas por endpoint en formato de texto de Prometheus.
+
+``MetricsMiddleware`` mide cada petición y la agrupa por ruta resuelta
+(``resolver_match.view_name``, p. ej. ``libro-list``) y método: latencia,
+número y tiempo de consultas SQL, tamaño de la respuesta y códigos de estado.
+Los datos se guardan en histogramas de cubos fijos en memoria, de tamaño
+constante por endpoint.
+
+Con varios procesos (workers de gunicorn), ``METRICS_MULTIPROC_DIR`` activa
+la agregación: cada proceso vuelca su copia a ``metrics-<pid>.json`` como
+mucho cada ``METRICS_FLUSH_INTERVAL`` segundos y ``/api/metrics`` suma los
+ficheros de todos. El directorio debe vaciarse al arrancar el servidor.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+from rest_framework import permissions
+from rest_framework.views import APIView
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+UNRESOLVED = 'unresolved'
+
+
+class Histogram:
+    """Histograma de cubos fijos: conteo por cubo, suma y total"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def merge(self, data):
+        self.counts = [a + b for a, b in zip(self.counts, data['counts'])]
+        self.sum += data['sum']
+
+    def to_dict(self):
+        return {'counts': list(self.counts), 'sum': self.sum}
+
+
+class EndpointMetrics:
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.size = Histogram(SIZE_BUCKETS)
+        self.query_seconds = 0.0
+        self.status = Counter()
+
+    def merge(self, data):
+        self.latency.merge(data['latency'])
+        self.queries.merge(data['queries'])
+        self.size.merge(data['size'])
+        self.query_seconds += data['query_seconds']
+        self.status.update(data['status'])
+
+    def to_dict(self):
+        return {
+            'latency': self.latency.to_dict(),
+            'queries': self.queries.to_dict(),
+            'size': self.size.to_dict(),
+            'query_seconds': self.query_seconds,
+            'status': dict(self.status),
+        }
+
+
+class MetricsRegistry:
+    """Métricas del proceso, protegidas con un lock"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.endpoints = {}
+            self._flushed_at = 0.0
+
+    def observe(self, route, method, status, seconds, queries, query_seconds, size):
+        with self._lock:
+            metrics = self.endpoints.get((route, method))
+            if metrics is None:
+                metrics = self.endpoints[(route, method)] = EndpointMetrics()
+            metrics.latency.observe(seconds)
+            metrics.queries.observe(queries)
+            metrics.query_seconds += query_seconds
+            if size is not None:
+                metrics.size.observe(size)
+            metrics.status[str(status)] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return [
+                {'route': route, 'method': method, **metrics.to_dict()}
+                for (route, method), metrics in self.endpoints.items()
+            ]
+
+    def flush(self, directory, force=False):
+        """Volcar la copia del proceso a ``directory`` (como mucho cada intervalo)"""
+        now = time.monotonic()
+        if not force and now - self._flushed_at < getattr(settings, 'METRICS_FLUSH_INTERVAL', 5):
+            return
+        self._flushed_at = now
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as tmp:
+            json.dump(self.snapshot(), tmp)
+        os.replace(tmp_path, directory / f'metrics-{os.getpid()}.json')
+
+
+registry = MetricsRegistry()
+
+
+def multiproc_dir():
+    return getattr(settings, 'METRICS_MULTIPROC_DIR', None)
+
+
+def collect():
+    """Métricas de este proceso o, en modo multiproceso, de todos"""
+    directory = multiproc_dir()
+    if not directory:
+        return registry.snapshot()
+
+    registry.flush(directory, force=True)
+    merged = {}
+    for path in Path(directory).glob('metrics-*.json'):
+        try:
+            entries = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+        for entry in entries:
+            key = (entry['route'], entry['method'])
+            merged.setdefault(key, EndpointMetrics()).merge(entry)
+    return [
+        {'route': route, 'method': method, **metrics.to_dict()}
+        for (route, method), metrics in merged.items()
+    ]
+
+
+def _labels(**labels):
+    return ','.join(
+        '{}="{}"'.format(key, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+        for key, value in labels.items()
+    )
+
+
+def _histogram(lines, name, help_text, buckets, entries, field):
+    lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+    for entry in entries:
+        labels = _labels(route=entry['route'], method=entry['method'])
+        data = entry[field]
+        cumulative = 0
+        for bound, count in zip((*buckets, '+Inf'), data['counts']):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_sum{{{labels}}} {data["sum"]}')
+        lines.append(f'{name}_count{{{labels}}} {cumulative}')
+
+
+def render_prometheus(entries):
+    entries = sorted(entries, key=lambda entry: (entry['route'], entry['method']))
+    lines = []
+    _histogram(lines, 'libreria_http_request_duration_seconds', 'Latencia de las peticiones',
+               LATENCY_BUCKETS, entries, 'latency')
+    _histogram(lines, 'libreria_http_db_queries', 'Consultas SQL por petición',
+               QUERY_BUCKETS, entries, 'queries')
+    _histogram(lines, 'libreria_http_response_size_bytes', 'Tamaño del cuerpo de la respuesta',
+               SIZE_BUCKETS, entries, 'size')
+
+    name = 'libreria_http_db_query_seconds_total'
+    lines += [f'# HELP {name} Tiempo total en consultas SQL', f'# TYPE {name} counter']
+    for entry in entries:
+        lines.append(f'{name}{{{_labels(route=entry["route"], method=entry["method"])}}} {entry["query_seconds"]}')
+
+    name = 'libreria_http_responses_total'
+    lines += [f'# HELP {name} Respuestas por código de estado', f'# TYPE {name} counter']
+    for entry in entries:
+        for status, count in sorted(entry['status'].items()):
+            labels = _labels(route=entry['route'], method=entry['method'], status=status)
+            lines.append(f'{name}{{{labels}}} {count}')
+    return '\n'.join(lines) + '\n'
+
+
+class QueryCounter:
+    """``execute_wrapper`` que cuenta las consultas y su duración"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - start
+
+
+def count_queries(counter):
+    """Contexto que aplica ``counter`` a todas las conexiones"""
+    stack = ExitStack()
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(counter))
+    return stack
+
+
+class MetricsMiddleware:
+    """Medir cada petición y anotarla en el registro del proceso.
+
+    En las respuestas en streaming (exportaciones) el trabajo y las consultas
+    ocurren al recorrer el cuerpo: la medición sigue hasta que se agota o se
+    cierra.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        start = time.perf_counter()
+        with count_queries(counter):
+            response = self.get_response(request)
+
+        match = request.resolver_match
+        route = (match.view_name or match.route) if match else UNRESOLVED
+
+        def observe(size):
+            registry.observe(route, request.method, response.status_code, time.perf_counter() - start,
+                             counter.count, counter.seconds, size)
+            directory = multiproc_dir()
+            if directory:
+                registry.flush(directory)
+
+        if not response.streaming:
+            observe(len(response.content))
+        elif response.is_async:
+            # Iterador asíncrono (ASGI): solo se mide hasta las cabeceras
+            length = response.get('Content-Length')
+            observe(int(length) if length else None)
+        else:
+            response.streaming_content = self._measure_stream(response.streaming_content, counter, observe)
+        return response
+
+    def _measure_stream(self, content, counter, observe):
+        size = 0
+        try:
+            with count_queries(counter):
+                for chunk in content:
+                    size += len(chunk)
+                    yield chunk
+        finally:
+            observe(size)
+
+
+class MetricsView(APIView):
+    """Métricas en formato de texto de Prometheus (solo administradores)"""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return HttpResponse(render_prometheus(collect()), content_type=CONTENT_TYPE)
@@ -0,0 +1,29 @@
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class CursorOrPageNumberPagination(CursorPagination):
+    """Paginación por cursor (keyset), sin COUNT(*) ni OFFSET.
+
+    El orden se toma de ``cursor_ordering`` en la vista, que debe terminar en
+    la clave primaria para desempatar. Los clientes que envían ``?page=``
+    siguen recibiendo la paginación por número de página.
+    """
+    page_query_param = 'page'
+
+    def get_ordering(self, request, queryset, view):
+        ordering = getattr(view, 'cursor_ordering', None)
+        if ordering:
+            return tuple(ordering)
+        return super().get_ordering(request, queryset, view)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_number_pagination = None
+        if self.page_query_param in request.query_params:
+            self.page_number_pagination = PageNumberPagination()
+            return self.page_number_pagination.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.page_number_pagination is not None:
+            return self.page_number_pagination.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,88 @@
+"""Reparto de lecturas entre la base de datos primaria y la réplica.
+
+``ReplicaRoutingMiddleware`` marca cada petición de la API con método seguro
+(GET, HEAD, OPTIONS) como apta para la réplica, y ``ReplicaRouter`` envía a
+ella las lecturas de los modelos de ``libros``, ``usuarios`` y ``auditoria``.
+Todo lo demás (escrituras, transacciones abiertas, comandos de gestión) usa la
+primaria.
+
+Para que un cliente lea lo que acaba de escribir pese al retraso de la
+réplica, una petición que escribe deja de usarla desde ese momento y envía una
+cookie con la que las siguientes peticiones leen de la primaria durante
+``DATABASE_REPLICA_STICKY_SECONDS`` segundos.
+"""
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_APPS = {'libros', 'usuarios', 'auditoria'}
+STICKY_COOKIE = 'db_primaria'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_estado = ContextVar('db_replica', default=None)
+
+
+class EstadoReplica:
+    """Decisión de la petición en curso"""
+
+    def __init__(self, usar_replica):
+        self.usar_replica = usar_replica
+        self.escrito = False
+
+
+def replica_alias():
+    """Alias de la réplica, o ``None`` si no hay ninguna configurada"""
+    alias = getattr(settings, 'DATABASE_REPLICA_ALIAS', 'replica')
+    return alias if alias in connections.settings else None
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        estado = _estado.get()
+        if estado is None or not estado.usar_replica or model._meta.app_label not in REPLICA_APPS:
+            return None
+        # Dentro de una transacción se lee lo que ella misma ha escrito
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return replica_alias()
+
+    def db_for_write(self, model, **hints):
+        estado = _estado.get()
+        if estado is not None:
+            estado.usar_replica = False
+            estado.escrito = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # La réplica contiene los mismos datos que la primaria
+        return True
+
+
+class ReplicaRoutingMiddleware:
+    """Decidir al principio de cada petición si sus lecturas pueden ir a la réplica"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        usar_replica = (
+            request.method in SAFE_METHODS
+            and request.path.startswith('/api/')
+            and STICKY_COOKIE not in request.COOKIES
+            and replica_alias() is not None
+        )
+        estado = EstadoReplica(usar_replica)
+        token = _estado.set(estado)
+        try:
+            response = self.get_response(request)
+        finally:
+            _estado.reset(token)
+
+        if estado.escrito and replica_alias() is not None:
+            response.set_cookie(
+                STICKY_COOKIE, '1',
+                max_age=getattr(settings, 'DATABASE_REPLICA_STICKY_SECONDS', 5),
+                httponly=True, samesite='Lax',
+            )
+        return response
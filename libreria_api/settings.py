@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 
+from decouple import config
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -45,13 +47,16 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'libreria_api.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'libreria_api.routers.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'auditoria.middleware.AuditBufferMiddleware',
 ]
 
 ROOT_URLCONF = 'libreria_api.urls'
@@ -77,13 +82,60 @@ WSGI_APPLICATION = 'libreria_api.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+def database_config(prefix='DB_', **defaults):
+    """Conexión a partir de las variables de entorno ``<prefix>ENGINE``, ``NAME``, ``USER``..."""
+    engine = config(f'{prefix}ENGINE', default=defaults.get('ENGINE', 'django.db.backends.sqlite3'))
+    database = {
+        'ENGINE': engine,
+        'NAME': config(f'{prefix}NAME', default=defaults.get('NAME', str(BASE_DIR / 'db.sqlite3'))),
+        # Conexiones persistentes, comprobadas antes de reutilizarse
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=60, cast=int),
+        'CONN_HEALTH_CHECKS': config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool),
     }
+    if engine == 'django.db.backends.sqlite3':
+        database['OPTIONS'] = {
+            # BEGIN IMMEDIATE: las transacciones que escriben esperan al
+            # bloqueo en lugar de fallar con "database is locked"
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        }
+        # Base de pruebas en fichero: la memoria compartida de SQLite bloquea
+        # por tabla y no permite las pruebas de concurrencia con hilos
+        database['TEST'] = {'NAME': str(BASE_DIR / 'test_db.sqlite3')}
+    else:
+        database.update({
+            'USER': config(f'{prefix}USER', default=defaults.get('USER', '')),
+            'PASSWORD': config(f'{prefix}PASSWORD', default=defaults.get('PASSWORD', '')),
+            'HOST': config(f'{prefix}HOST', default=defaults.get('HOST', 'localhost')),
+            'PORT': config(f'{prefix}PORT', default=defaults.get('PORT', '3306')),
+            'OPTIONS': {
+                'charset': 'utf8mb4',
+                'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
+            },
+        })
+    return database
+
+
+DATABASES = {
+    'default': database_config(),
 }
 
+# Réplica de lectura opcional: DB_REPLICA_HOST (MySQL) o DB_REPLICA_NAME (SQLite).
+# El resto de valores se heredan de la primaria salvo que se indiquen.
+DATABASE_REPLICA_ALIAS = 'replica'
+if config('DB_REPLICA_HOST', default='') or config('DB_REPLICA_NAME', default=''):
+    DATABASES[DATABASE_REPLICA_ALIAS] = {
+        **database_config('DB_REPLICA_', **DATABASES['default']),
+        # En las pruebas la réplica es la misma base que la primaria
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['libreria_api.routers.ReplicaRouter']
+
+# Tras una escritura, las lecturas de ese cliente van a la primaria durante
+# estos segundos (cookie), para que vea sus propios cambios pese al retraso
+DATABASE_REPLICA_STICKY_SECONDS = config('DB_REPLICA_STICKY_SECONDS', default=5, cast=int)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -121,12 +173,77 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Ficheros subidos (portadas) y sus miniaturas generadas bajo demanda
+MEDIA_URL = 'media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+LIBROS_RENDITIONS_DIR = MEDIA_ROOT / 'renditions'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Auditoría: tamaño y antigüedad máxima (segundos) del buffer de logs
+AUDIT_BUFFER_MAX_SIZE = 500
+AUDIT_BUFFER_MAX_AGE = 5.0
+
+# Logs más recientes que esto se dejan para la siguiente actualización del resumen diario
+AUDIT_ROLLUP_GRACE_SECONDS = 60
+
+# Retención de logs en la tabla; los anteriores se archivan en segmentos mensuales
+AUDIT_RETENTION_DAYS = 365
+AUDIT_ARCHIVE_DIR = BASE_DIR / 'audit_archive'
+
+# Caché local por defecto: no requiere ningún servicio externo, pero es propia
+# de cada proceso. Con varios workers de gunicorn los sellos de versión del
+# catálogo no se comparten y cada worker puede servir respuestas antiguas hasta
+# LIBROS_CACHE_TIMEOUT; en ese caso hay que usar un backend compartido, p. ej.
+# CACHE_BACKEND=django.core.cache.backends.redis.RedisCache y
+# CACHE_LOCATION=redis://127.0.0.1:6379/1
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='libreria-api'),
+    },
+    # Usuarios autenticados por token. En memoria del proceso (acotada en
+    # número de entradas) un token borrado sigue valiendo en los demás
+    # workers hasta AUTH_TOKEN_CACHE_TIMEOUT; con varios workers conviene una
+    # caché compartida (AUTH_CACHE_BACKEND / AUTH_CACHE_LOCATION)
+    'auth': {
+        'BACKEND': config('AUTH_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('AUTH_CACHE_LOCATION', default='libreria-api-auth'),
+    },
+}
+if CACHES['auth']['BACKEND'] == 'django.core.cache.backends.locmem.LocMemCache':
+    CACHES['auth']['OPTIONS'] = {'MAX_ENTRIES': 10000}
+
+# Caché de respuestas del catálogo (segundos)
+LIBROS_CACHE_TIMEOUT = 300
+
+# Vida (segundos) del usuario autenticado por token en la caché 'auth'
+AUTH_TOKEN_CACHE_TIMEOUT = 60
+
+# Máximo de elementos por petición en los préstamos y devoluciones en bloque
+PRESTAMOS_BULK_MAX = 100
+
+# Tamaño máximo (bytes) del fichero en /api/libros/libros/importar/; los
+# catálogos mayores se importan con el comando importar_catalogo
+LIBROS_IMPORT_MAX_UPLOAD_BYTES = 5 * 1024 * 1024
+
+# Métricas por endpoint (/api/metrics). Con varios workers, directorio donde
+# cada proceso vuelca las suyas cada METRICS_FLUSH_INTERVAL segundos
+METRICS_MULTIPROC_DIR = config('METRICS_MULTIPROC_DIR', default='') or None
+METRICS_FLUSH_INTERVAL = 5
+
 # Logging Configuration
+# Los ficheros se escriben desde un hilo en segundo plano (QueueHandler): las
+# peticiones solo encolan el registro. Rotación por tamaño para django.log y
+# diaria para audit.log.
+LOG_DIR = BASE_DIR / 'logs'
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+AUDIT_LOG_BACKUP_DAYS = 30
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -140,21 +257,24 @@ LOGGING = {
             'style': '{',
         },
         'audit': {
-            'format': '{asctime} - {user} - {action} - {object_type} - {object_id} - {changes}',
-            'style': '{',
+            '()': 'libreria_api.log_handlers.JsonAuditFormatter',
         },
     },
     'handlers': {
         'file': {
             'level': 'INFO',
-            'class': 'logging.FileHandler',
-            'filename': BASE_DIR / 'logs' / 'django.log',
+            'class': 'libreria_api.log_handlers.QueueRotatingFileHandler',
+            'filename': LOG_DIR / 'django.log',
+            'maxBytes': LOG_MAX_BYTES,
+            'backupCount': LOG_BACKUP_COUNT,
             'formatter': 'verbose',
         },
         'audit_file': {
             'level': 'INFO',
-            'class': 'logging.FileHandler',
-            'filename': BASE_DIR / 'logs' / 'audit.log',
+            'class': 'libreria_api.log_handlers.QueueTimedRotatingFileHandler',
+            'filename': LOG_DIR / 'audit.log',
+            'when': 'midnight',
+            'backupCount': AUDIT_LOG_BACKUP_DAYS,
             'formatter': 'audit',
         },
         'console': {
@@ -185,7 +305,7 @@ LOGGING = {
 # Django REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'usuarios.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -16,10 +16,12 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from .metrics import MetricsView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/libros/', include('libros.urls')),
     path('api/usuarios/', include('usuarios.urls')),
     path('api/auditoria/', include('auditoria.urls')),
+    path('api/metrics', MetricsView.as_view(), name='metrics'),
 ]
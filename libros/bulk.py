@@ -0,0 +1,165 @@
+"""Préstamos y devoluciones en bloque para el mostrador de circulación.
+
+Cada lote se procesa en una transacción con un número fijo de consultas:
+lectura con bloqueo, ``bulk_create``/``bulk_update`` de préstamos y libros, un
+UPDATE de los contadores de los perfiles y un único INSERT de auditoría. Los
+elementos que no se pueden procesar se informan uno a uno sin abortar el lote.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from auditoria.buffer import add_audit_logs
+from auditoria.models import AuditLog
+from usuarios.models import PerfilUsuario
+
+from .caching import bump_version
+from .models import Libro, Prestamo
+
+DEFAULT_MAX_ITEMS = 100
+
+
+def max_items():
+    return getattr(settings, 'PRESTAMOS_BULK_MAX', DEFAULT_MAX_ITEMS)
+
+
+class BulkPrestamoItemSerializer(serializers.Serializer):
+    """Un préstamo del lote; los ids se comprueban juntos, sin una consulta por elemento"""
+    libro = serializers.IntegerField()
+    usuario = serializers.IntegerField()
+    fecha_devolucion = serializers.DateField()
+    observaciones = serializers.CharField(required=False, allow_blank=True)
+
+
+def _error(resultado, mensaje):
+    resultado.update({'ok': False, 'error': mensaje})
+    return resultado
+
+
+def bulk_prestar(items, bibliotecario):
+    """Prestar varios libros; devuelve un resultado por elemento, en orden"""
+    resultados = [{'indice': indice} for indice in range(len(items))]
+    validos = []
+    for resultado, item in zip(resultados, items):
+        serializer = BulkPrestamoItemSerializer(data=item)
+        if serializer.is_valid():
+            validos.append((resultado, serializer.validated_data))
+        else:
+            _error(resultado, serializer.errors)
+
+    now = timezone.now()
+    with transaction.atomic():
+        # Perfiles antes que libros, en el mismo orden que LibroViewSet.prestar:
+        # un lote y un préstamo individual simultáneos no se bloquean en cruz
+        perfiles = {
+            perfil.user_id: perfil
+            for perfil in PerfilUsuario.objects.select_for_update().filter(
+                user_id__in={datos['usuario'] for _, datos in validos}
+            )
+        }
+        libros = Libro.objects.select_for_update().select_related('autor').in_bulk(
+            {datos['libro'] for _, datos in validos}
+        )
+
+        nuevos, ocupados, deltas = [], [], {}
+        for resultado, datos in validos:
+            libro = libros.get(datos['libro'])
+            perfil = perfiles.get(datos['usuario'])
+            if libro is None:
+                _error(resultado, 'El libro no existe')
+            elif perfil is None:
+                _error(resultado, 'El usuario no tiene perfil')
+            elif libro.estado != 'disponible':
+                # Incluye los libros ya prestados en este mismo lote
+                _error(resultado, 'El libro no está disponible')
+            elif perfil.prestamos_activos + deltas.get(perfil.user_id, 0) >= perfil.limite_prestamos:
+                _error(resultado, 'El usuario ha alcanzado su límite de préstamos')
+            else:
+                libro.estado = 'prestado'
+                libro.fecha_actualizacion = now
+                ocupados.append(libro)
+                deltas[perfil.user_id] = deltas.get(perfil.user_id, 0) + 1
+                nuevos.append((resultado, Prestamo(
+                    libro=libro, usuario_id=perfil.user_id, fecha_devolucion=datos['fecha_devolucion'],
+                    observaciones=datos.get('observaciones'), estado='activo', fecha_actualizacion=now
+                )))
+
+        prestamos = Prestamo.objects.bulk_create([prestamo for _, prestamo in nuevos])
+        if prestamos and prestamos[0].pk is None:
+            # MySQL no devuelve las claves del INSERT: cada libro del lote está
+            # bloqueado y tiene un único préstamo activo, el recién creado
+            ids = dict(Prestamo.objects.filter(
+                libro_id__in=[prestamo.libro_id for prestamo in prestamos], estado='activo'
+            ).values_list('libro_id', 'id'))
+            for prestamo in prestamos:
+                prestamo.pk = ids[prestamo.libro_id]
+        Libro.objects.bulk_update(ocupados, ['estado', 'fecha_actualizacion'])
+        PerfilUsuario.ajustar_prestamos_activos_en_bloque(deltas)
+        add_audit_logs(
+            AuditLog(
+                user=bibliotecario, action='PRESTAMO', object_type='Libro',
+                object_id=prestamo.libro_id, object_repr=str(prestamo.libro)[:200],
+                changes={
+                    'estado': {'old': 'disponible', 'new': 'prestado'},
+                    'prestamo': prestamo.pk, 'usuario': prestamo.usuario_id,
+                }
+            )
+            for prestamo in prestamos
+        )
+        if ocupados:
+            transaction.on_commit(lambda: bump_version(Libro))
+
+    for resultado, prestamo in nuevos:
+        resultado.update({'ok': True, 'prestamo': prestamo.pk, 'libro': prestamo.libro_id})
+    return resultados
+
+
+def bulk_devolver(ids, bibliotecario):
+    """Devolver varios préstamos; devuelve un resultado por id, en orden"""
+    now = timezone.now()
+    resultados = []
+    with transaction.atomic():
+        prestamos = Prestamo.objects.select_for_update().select_related('libro', 'usuario').in_bulk(ids)
+
+        devueltos, anteriores, libros, deltas = [], {}, [], {}
+        for prestamo_id in ids:
+            resultado = {'prestamo': prestamo_id}
+            resultados.append(resultado)
+            prestamo = prestamos.get(prestamo_id)
+            if prestamo is None:
+                _error(resultado, 'El préstamo no existe')
+            elif prestamo.estado not in ('activo', 'vencido'):
+                # Incluye los ids repetidos en el lote
+                _error(resultado, 'El préstamo no está activo')
+            else:
+                # Los vencidos ya no cuentan en el límite del usuario
+                if prestamo.estado == 'activo':
+                    deltas[prestamo.usuario_id] = deltas.get(prestamo.usuario_id, 0) - 1
+                anteriores[prestamo.pk] = prestamo.estado
+                prestamo.estado = 'devuelto'
+                prestamo.fecha_devuelto = now
+                prestamo.fecha_actualizacion = now
+                prestamo.libro.estado = 'disponible'
+                prestamo.libro.fecha_actualizacion = now
+                devueltos.append(prestamo)
+                libros.append(prestamo.libro)
+                resultado.update({'ok': True, 'libro': prestamo.libro_id})
+
+        Prestamo.objects.bulk_update(devueltos, ['estado', 'fecha_devuelto', 'fecha_actualizacion'])
+        Libro.objects.bulk_update(libros, ['estado', 'fecha_actualizacion'])
+        PerfilUsuario.ajustar_prestamos_activos_en_bloque(deltas)
+        add_audit_logs(
+            AuditLog(
+                user=bibliotecario, action='DEVOLUCION', object_type='Prestamo',
+                object_id=prestamo.pk, object_repr=str(prestamo)[:200],
+                changes={
+                    'estado': {'old': anteriores[prestamo.pk], 'new': 'devuelto'},
+                    'libro': prestamo.libro_id,
+                }
+            )
+            for prestamo in devueltos
+        )
+        if libros:
+            transaction.on_commit(lambda: bump_version(Libro))
+    return resultados
@@ -0,0 +1,98 @@
+"""Caché de respuestas de lectura del catálogo.
+
+Cada respuesta se guarda con una clave que incluye la URL, los parámetros
+ordenados, las clases de permiso de la vista y el sello de versión de cada
+modelo del que depende. Las señales de guardado y borrado incrementan el sello
+del modelo, así que las entradas antiguas dejan de usarse sin tener que
+buscarlas; caducan solas por ``LIBROS_CACHE_TIMEOUT``.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import status
+from rest_framework.response import Response
+
+DEFAULT_TIMEOUT = 300
+
+
+def get_cache():
+    return caches[getattr(settings, 'LIBROS_CACHE_ALIAS', 'default')]
+
+
+def _version_key(model):
+    return f'libros:version:{model._meta.label_lower}'
+
+
+def bump_version(*models):
+    """Invalidar las respuestas que dependen de ``models``.
+
+    Las señales lo llaman tras el commit de cada guardado o borrado; quien
+    use ``update()`` o ``bulk_create()`` debe llamarlo a mano, también desde
+    ``transaction.on_commit``.
+    """
+    cache = get_cache()
+    for model in models:
+        key = _version_key(model)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Sello inexistente o expulsado: empieza en un valor que no se repite
+            cache.add(key, time.time_ns(), timeout=None)
+
+
+def get_versions(models):
+    cache = get_cache()
+    keys = [_version_key(model) for model in models]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def response_cache_key(request, permission_classes, models):
+    params = sorted(
+        (param, value) for param, values in request.query_params.lists() for value in values
+    )
+    parts = [
+        f'{request.scheme}://{request.get_host()}{request.path}',
+        repr(params),
+        ','.join(f'{cls.__module__}.{cls.__qualname__}' for cls in permission_classes),
+        repr(get_versions(models)),
+    ]
+    digest = hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()
+    return f'libros:response:{digest}'
+
+
+class CachedResponseMixin:
+    """Servir ``list`` y ``retrieve`` desde la caché.
+
+    ``cache_dependencies`` son los modelos cuyos datos aparecen en la
+    respuesta. La autenticación y los permisos se comprueban antes de
+    consultar la caché.
+    """
+    cache_dependencies = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        cache = get_cache()
+        # Los sellos se leen antes de consultar: si hay una escritura a la
+        # vez, la respuesta queda guardada con la versión ya superada
+        key = response_cache_key(request, self.permission_classes, self.cache_dependencies)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            timeout = getattr(settings, 'LIBROS_CACHE_TIMEOUT', DEFAULT_TIMEOUT)
+            cache.set(key, response.data, timeout)
+        return response
@@ -0,0 +1,76 @@
+"""GET condicional (ETag) a partir de ``fecha_actualizacion``.
+
+Antes de serializar se hace una única consulta agregada sobre el queryset de
+la vista (``MAX(fecha_actualizacion)`` y ``COUNT``, o solo la fila pedida en el
+detalle). Si ``If-None-Match`` coincide se responde 304 sin cuerpo.
+
+No se envía ``Last-Modified``: borrar una fila o editar un autor o género no
+adelanta ``fecha_actualizacion``, así que ``If-Modified-Since`` daría 304 con
+datos ya cambiados, tanto en los listados como en los detalles.
+"""
+import hashlib
+
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.http import Http404
+from django.utils.cache import get_conditional_response, quote_etag
+from rest_framework import status
+
+from .caching import get_versions
+
+
+class ConditionalGetMixin:
+    """ETag fuerte para ``list`` y ``retrieve``.
+
+    La ETag incluye la URL, el usuario, el agregado de ``fecha_actualizacion``
+    y los sellos de versión de ``cache_dependencies``, para que un cambio en
+    un modelo relacionado (p. ej. el nombre del autor) también la cambie.
+    """
+    cache_dependencies = ()
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        return self.conditional_response(queryset, super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            queryset = self.filter_queryset(self.get_queryset()).filter(
+                **{self.lookup_field: kwargs[lookup_url_kwarg]}
+            )
+        except (TypeError, ValueError, ValidationError):
+            # Igual que get_object_or_404 de DRF: un pk mal formado es un 404
+            raise Http404
+        return self.conditional_response(queryset, super().retrieve, request, *args, **kwargs)
+
+    def get_etag(self, request, queryset):
+        """ETag del queryset, o ``None`` si no hay filas"""
+        stats = queryset.order_by().aggregate(
+            ultima=Max('fecha_actualizacion'), total=Count('pk')
+        )
+        if not stats['total']:
+            return None
+
+        parts = [
+            request.get_full_path(),
+            str(request.user.pk),
+            stats['ultima'].isoformat(),
+            str(stats['total']),
+            repr(get_versions(self.cache_dependencies)),
+        ]
+        etag = hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()
+        return quote_etag(etag)
+
+    def conditional_response(self, queryset, handler, request, *args, **kwargs):
+        etag = self.get_etag(request, queryset)
+        if etag is None:
+            # Sin filas el listado vacío o el 404 son baratos: sin validadores
+            return handler(request, *args, **kwargs)
+
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+        response.headers['ETag'] = etag
+        return response
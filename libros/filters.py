@@ -0,0 +1,71 @@
+"""Filtros del catálogo y conteo de facetas"""
+from collections import Counter
+
+from django.db.models import Count, F, IntegerField
+from django.db.models.functions import Cast, Floor
+from rest_framework.exceptions import ValidationError
+
+from .models import Libro
+
+INTEGER_FILTERS = {
+    'genero': 'genero_id',
+    'anio_publicacion': 'anio_publicacion',
+    'anio_desde': 'anio_publicacion__gte',
+    'anio_hasta': 'anio_publicacion__lte',
+}
+
+
+def filter_libros(queryset, params):
+    """Aplicar ``genero``, ``estado``, ``idioma`` y los filtros de año"""
+    for param, lookup in INTEGER_FILTERS.items():
+        value = params.get(param)
+        if value in (None, ''):
+            continue
+        try:
+            queryset = queryset.filter(**{lookup: int(value)})
+        except ValueError:
+            raise ValidationError({param: 'Debe ser un número entero'})
+
+    estado = params.get('estado')
+    if estado:
+        if estado not in dict(Libro.ESTADO_CHOICES):
+            raise ValidationError({'estado': f'Estado inválido: {estado}'})
+        queryset = queryset.filter(estado=estado)
+
+    idioma = params.get('idioma')
+    if idioma:
+        queryset = queryset.filter(idioma=idioma)
+    return queryset
+
+
+def facet_counts(queryset):
+    """Conteos por género, estado, idioma y década en una sola consulta.
+
+    Se agrupa por la combinación de las cuatro facetas y cada faceta se suma
+    en Python, en lugar de hacer una consulta agrupada por faceta.
+    """
+    rows = (
+        queryset.order_by()
+        .annotate(decada=Cast(Floor(F('anio_publicacion') / 10) * 10, IntegerField()))
+        .values('genero_id', 'genero__nombre', 'estado', 'idioma', 'decada')
+        .annotate(total=Count('id'))
+    )
+
+    generos, nombres = Counter(), {}
+    estados, idiomas, decadas = Counter(), Counter(), Counter()
+    for row in rows:
+        generos[row['genero_id']] += row['total']
+        nombres[row['genero_id']] = row['genero__nombre']
+        estados[row['estado']] += row['total']
+        idiomas[row['idioma']] += row['total']
+        decadas[row['decada']] += row['total']
+
+    return {
+        'genero': [
+            {'id': genero_id, 'nombre': nombres[genero_id], 'total': total}
+            for genero_id, total in generos.most_common()
+        ],
+        'estado': [{'valor': valor, 'total': total} for valor, total in estados.most_common()],
+        'idioma': [{'valor': valor, 'total': total} for valor, total in idiomas.most_common()],
+        'decada': [{'valor': valor, 'total': total} for valor, total in sorted(decadas.items())],
+    }
@@ -0,0 +1,242 @@
+"""Importación masiva del catálogo desde CSV o JSONL.
+
+El fichero se lee en streaming y se procesa por bloques: autores y géneros se
+resuelven con mapas en memoria (cada uno se crea una sola vez), los libros del
+bloque se deduplican por ISBN y se insertan o actualizan con un único
+``bulk_create(update_conflicts=True)``. Solo el bloque en curso y los mapas de
+autores y géneros quedan en memoria.
+
+Columnas: ``titulo``, ``isbn``, ``anio_publicacion``, ``autor_nombre``,
+``autor_apellido`` y, opcionales, ``genero``, ``editorial``, ``num_paginas``,
+``idioma`` y ``descripcion``.
+"""
+import csv
+import io
+import json
+import time
+
+from django.db import connection, transaction
+
+from auditoria.buffer import add_audit_log
+from auditoria.models import AuditLog
+
+from .caching import bump_version
+from .models import Autor, Genero, Libro
+from .search import index_libros
+
+FORMATS = ('csv', 'jsonl')
+DEFAULT_CHUNK_SIZE = 2000
+MAX_ERRORS = 100
+# Tamaño máximo del fichero en /importar/ (la importación se hace en la petición)
+DEFAULT_IMPORT_MAX_UPLOAD_BYTES = 5 * 1024 * 1024
+
+UPDATE_FIELDS = [
+    'titulo', 'autor', 'genero', 'anio_publicacion', 'editorial',
+    'num_paginas', 'idioma', 'descripcion', 'fecha_actualizacion',
+]
+
+
+def upsert_options():
+    """Opciones de ``bulk_create`` para insertar o actualizar por ISBN.
+
+    MySQL no admite indicar la restricción del conflicto (``ON DUPLICATE KEY``
+    usa cualquier clave única); ``isbn`` es la única además de la primaria.
+    """
+    options = {'update_conflicts': True, 'update_fields': UPDATE_FIELDS}
+    if connection.features.supports_update_conflicts_with_target:
+        options['unique_fields'] = ['isbn']
+    return options
+
+
+def detect_format(filename):
+    """Formato según la extensión (``.csv``, ``.jsonl`` o ``.ndjson``)"""
+    name = filename.lower()
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    raise ValueError(f'Formato no reconocido: {filename}')
+
+
+def iter_records(stream, fmt):
+    """Registros de un flujo binario, con su número de línea"""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for record in reader:
+            yield reader.line_num, record
+    elif fmt == 'jsonl':
+        for line_num, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield line_num, json.loads(line)
+            except json.JSONDecodeError:
+                # Se informa como registro inválido sin detener la importación
+                yield line_num, None
+    else:
+        raise ValueError(f'Formato no soportado: {fmt}')
+
+
+def _text(record, field, max_length=None, required=False):
+    value = record.get(field)
+    value = str(value).strip() if value not in (None, '') else ''
+    if required and not value:
+        raise ValueError(f'{field} es obligatorio')
+    if max_length and len(value) > max_length:
+        raise ValueError(f'{field} supera {max_length} caracteres')
+    return value
+
+
+def _integer(record, field, required=False):
+    value = record.get(field)
+    if value in (None, ''):
+        if required:
+            raise ValueError(f'{field} es obligatorio')
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{field} debe ser un número entero')
+
+
+def parse_record(record):
+    """Campos validados de un registro; ``ValueError`` si no es válido"""
+    if not isinstance(record, dict):
+        raise ValueError('Registro no válido')
+    return {
+        'titulo': _text(record, 'titulo', 200, required=True),
+        'isbn': _text(record, 'isbn', 13, required=True),
+        'anio_publicacion': _integer(record, 'anio_publicacion', required=True),
+        'autor': (
+            _text(record, 'autor_nombre', 100, required=True),
+            _text(record, 'autor_apellido', 100, required=True),
+        ),
+        'genero': _text(record, 'genero', 50) or None,
+        'editorial': _text(record, 'editorial', 100) or None,
+        'num_paginas': _integer(record, 'num_paginas'),
+        'idioma': _text(record, 'idioma', 50) or 'Español',
+        'descripcion': _text(record, 'descripcion') or None,
+    }
+
+
+class CatalogImporter:
+    """Importa registros por bloques y acumula las estadísticas"""
+
+    def __init__(self, chunk_size=DEFAULT_CHUNK_SIZE, user=None, progress=None):
+        self.chunk_size = chunk_size
+        self.user = user
+        self.progress = progress
+        self.autores = {
+            (nombre, apellido): pk
+            for pk, nombre, apellido in Autor.objects.values_list('pk', 'nombre', 'apellido').iterator()
+        }
+        self.generos = dict(Genero.objects.values_list('nombre', 'pk'))
+        self.stats = {
+            'leidos': 0, 'importados': 0, 'duplicados': 0, 'invalidos': 0,
+            'autores_creados': 0, 'generos_creados': 0, 'errores': [],
+        }
+
+    def run(self, records):
+        started = time.monotonic()
+        chunk = {}
+        for line_num, record in records:
+            self.stats['leidos'] += 1
+            try:
+                data = parse_record(record)
+            except ValueError as e:
+                self._error(line_num, e)
+                continue
+            if data['isbn'] in chunk:
+                # Dentro del bloque gana la última aparición del ISBN
+                self.stats['duplicados'] += 1
+            chunk[data['isbn']] = data
+            if len(chunk) >= self.chunk_size:
+                self._import_chunk(list(chunk.values()))
+                chunk = {}
+                self._report(started)
+        if chunk:
+            self._import_chunk(list(chunk.values()))
+
+        elapsed = time.monotonic() - started
+        self.stats['segundos'] = round(elapsed, 3)
+        self.stats['libros_por_segundo'] = round(self.stats['importados'] / elapsed, 1) if elapsed else None
+        self._audit()
+        return self.stats
+
+    def _error(self, line_num, error):
+        self.stats['invalidos'] += 1
+        if len(self.stats['errores']) < MAX_ERRORS:
+            self.stats['errores'].append({'linea': line_num, 'error': str(error)})
+
+    def _report(self, started):
+        if self.progress:
+            elapsed = time.monotonic() - started
+            self.progress(self.stats['importados'], self.stats['importados'] / elapsed if elapsed else 0)
+
+    def _intern_autores(self, keys):
+        missing = [key for key in dict.fromkeys(keys) if key not in self.autores]
+        if not missing:
+            return
+        created = Autor.objects.bulk_create([
+            Autor(nombre=nombre, apellido=apellido) for nombre, apellido in missing
+        ])
+        self.stats['autores_creados'] += len(created)
+        if all(autor.pk for autor in created):
+            self.autores.update(((autor.nombre, autor.apellido), autor.pk) for autor in created)
+        else:
+            # Motores sin RETURNING (MySQL): se leen los ids recién creados
+            nombres = {nombre for nombre, _ in missing}
+            for pk, nombre, apellido in Autor.objects.filter(nombre__in=nombres).values_list(
+                    'pk', 'nombre', 'apellido'):
+                self.autores.setdefault((nombre, apellido), pk)
+
+    def _intern_generos(self, nombres):
+        missing = [nombre for nombre in dict.fromkeys(nombres) if nombre and nombre not in self.generos]
+        if not missing:
+            return
+        Genero.objects.bulk_create([Genero(nombre=nombre) for nombre in missing], ignore_conflicts=True)
+        found = dict(Genero.objects.filter(nombre__in=missing).values_list('nombre', 'pk'))
+        self.stats['generos_creados'] += len(found)
+        self.generos.update(found)
+
+    def _import_chunk(self, rows):
+        with transaction.atomic():
+            self._intern_autores(row['autor'] for row in rows)
+            self._intern_generos(row['genero'] for row in rows)
+            Libro.objects.bulk_create(
+                [
+                    Libro(
+                        titulo=row['titulo'], isbn=row['isbn'], anio_publicacion=row['anio_publicacion'],
+                        autor_id=self.autores[row['autor']], genero_id=self.generos.get(row['genero']),
+                        editorial=row['editorial'], num_paginas=row['num_paginas'],
+                        idioma=row['idioma'], descripcion=row['descripcion'],
+                    )
+                    for row in rows
+                ],
+                **upsert_options(),
+            )
+            # bulk_create no envía señales: índice de búsqueda y caché a mano
+            index_libros(Libro.objects.filter(isbn__in=[row['isbn'] for row in rows]).select_related('autor'))
+            transaction.on_commit(lambda: bump_version(Libro, Autor, Genero))
+        self.stats['importados'] += len(rows)
+
+    def _audit(self):
+        if not self.stats['importados']:
+            return
+        resumen = {key: value for key, value in self.stats.items() if key != 'errores'}
+        add_audit_log(AuditLog(
+            user=self.user,
+            action='CREATE',
+            object_type='Libro',
+            object_repr=f"Importación de {self.stats['importados']} libros",
+            changes={'importacion': resumen},
+        ))
+
+
+def import_catalog(stream, fmt, chunk_size=DEFAULT_CHUNK_SIZE, user=None, progress=None):
+    """Importar un flujo binario CSV/JSONL; devuelve las estadísticas"""
+    if fmt not in FORMATS:
+        raise ValueError(f'Formato no soportado: {fmt}')
+    importer = CatalogImporter(chunk_size=chunk_size, user=user, progress=progress)
+    return importer.run(iter_records(stream, fmt))
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from auditoria.buffer import audit_buffer
+from libros.importer import DEFAULT_CHUNK_SIZE, FORMATS, detect_format, import_catalog
+
+
+class Command(BaseCommand):
+    help = 'Importar libros desde un fichero CSV o JSONL, insertando o actualizando por ISBN'
+
+    def add_arguments(self, parser):
+        parser.add_argument('fichero', help='Ruta del fichero CSV o JSONL')
+        parser.add_argument(
+            '--format',
+            choices=FORMATS,
+            help='Formato del fichero (por defecto, según la extensión)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help='Libros insertados por bloque',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            fmt = options['format'] or detect_format(options['fichero'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        def progress(importados, por_segundo):
+            self.stdout.write(f'{importados} libros importados ({por_segundo:.0f} libros/s)')
+
+        with open(options['fichero'], 'rb') as stream, audit_buffer():
+            stats = import_catalog(stream, fmt, chunk_size=options['chunk_size'], progress=progress)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['importados']} libros importados en {stats['segundos']} s "
+            f"({stats['libros_por_segundo'] or 0:.0f} libros/s); "
+            f"{stats['autores_creados']} autores y {stats['generos_creados']} géneros nuevos"
+        ))
+        if stats['invalidos']:
+            self.stdout.write(self.style.WARNING(f"{stats['invalidos']} registros inválidos:"))
+            for error in stats['errores']:
+                self.stdout.write(f"  línea {error['linea']}: {error['error']}")
@@ -0,0 +1,28 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from auditoria.buffer import audit_buffer
+from libros.overdue import OVERDUE_CHUNK_SIZE, mark_overdue
+
+
+class Command(BaseCommand):
+    help = 'Marcar como vencidos los préstamos activos cuya fecha de devolución ya pasó'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fecha',
+            type=date.fromisoformat,
+            help='Fecha de referencia YYYY-MM-DD (por defecto, hoy)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=OVERDUE_CHUNK_SIZE,
+            help='Préstamos actualizados por bloque',
+        )
+
+    def handle(self, *args, **options):
+        with audit_buffer():
+            marked = mark_overdue(today=options['fecha'], chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'{marked} préstamos marcados como vencidos'))
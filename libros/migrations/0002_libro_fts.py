@@ -0,0 +1,36 @@
+from django.db import migrations
+
+from libros.search import create_index_table, drop_index_table, get_backend
+
+
+def crear_indice(apps, schema_editor):
+    create_index_table(schema_editor)
+    backend = get_backend(schema_editor.connection)
+    if backend is None:
+        return
+    Libro = apps.get_model('libros', 'Libro')
+    libros = Libro.objects.select_related('autor').order_by('pk')
+    with schema_editor.connection.cursor() as cursor:
+        lote = []
+        for libro in libros.iterator(chunk_size=1000):
+            lote.append(libro)
+            if len(lote) == 1000:
+                backend.index(cursor, lote)
+                lote = []
+        if lote:
+            backend.index(cursor, lote)
+
+
+def borrar_indice(apps, schema_editor):
+    drop_index_table(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('libros', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice, borrar_indice),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.11 on 2026-10-17 16:02
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('libros', '0003_libro_catalogo_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='prestamo',
+            name='fecha_actualizacion',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
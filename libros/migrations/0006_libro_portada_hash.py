@@ -0,0 +1,33 @@
+# Generated by Django 5.2.11 on 2026-10-17 15:40
+
+from django.db import migrations, models
+
+
+def calcular_portada_hash(apps, schema_editor):
+    from libros.renditions import hash_file
+
+    Libro = apps.get_model('libros', 'Libro')
+    libros = []
+    for libro in Libro.objects.exclude(portada='').exclude(portada__isnull=True).only('pk', 'portada'):
+        try:
+            libro.portada_hash = hash_file(libro.portada)
+        except FileNotFoundError:
+            continue
+        libros.append(libro)
+    Libro.objects.bulk_update(libros, ['portada_hash'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('libros', '0005_prestamo_vencimiento_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='libro',
+            name='portada_hash',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=64),
+        ),
+        migrations.RunPython(calcular_portada_hash, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,9 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.db import transaction
 from django.utils import timezone
+from usuarios.models import PerfilUsuario
+from .renditions import hash_file, purge_renditions
 
 class Autor(models.Model):
     nombre = models.CharField(max_length=100)
@@ -46,6 +49,8 @@ class Libro(models.Model):
     descripcion = models.TextField(blank=True, null=True)
     estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='disponible')
     portada = models.ImageField(upload_to='portadas/', blank=True, null=True)
+    # SHA-256 del contenido de la portada: identifica sus miniaturas
+    portada_hash = models.CharField(max_length=64, blank=True, default='', editable=False, db_index=True)
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     fecha_actualizacion = models.DateTimeField(auto_now=True)
     
@@ -53,9 +58,42 @@ class Libro(models.Model):
         verbose_name = "Libro"
         verbose_name_plural = "Libros"
         ordering = ['-fecha_creacion']
+        indexes = [
+            # Filtros y facetas del catálogo
+            models.Index(fields=['genero', 'estado'], name='libro_genero_estado_idx'),
+            models.Index(fields=['estado'], name='libro_estado_idx'),
+            models.Index(fields=['idioma'], name='libro_idioma_idx'),
+            models.Index(fields=['anio_publicacion'], name='libro_anio_idx'),
+            # Orden de la paginación por cursor
+            models.Index(fields=['-fecha_creacion', '-id'], name='libro_creacion_idx'),
+        ]
     
     def __str__(self):
         return f"{self.titulo} - {self.autor}"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Portada guardada, para recalcular el hash solo si cambia
+        instance._portada_guardada = instance.__dict__.get('portada')
+        return instance
+    
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        anterior = self.portada_hash
+        portada = self.portada.name or ''
+        cambiada = portada != (getattr(self, '_portada_guardada', None) or '') or not self.portada._committed
+        if cambiada and (update_fields is None or 'portada' in update_fields):
+            self.portada_hash = hash_file(self.portada) if portada else ''
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'portada_hash'}
+        super().save(*args, **kwargs)
+        self._portada_guardada = self.portada.name
+        
+        if anterior and anterior != self.portada_hash:
+            # Las miniaturas de la portada anterior sobran si ningún libro la usa
+            if not Libro.objects.filter(portada_hash=anterior).exists():
+                transaction.on_commit(lambda: purge_renditions(anterior))
 
 class Prestamo(models.Model):
     ESTADO_CHOICES = [
@@ -71,18 +109,36 @@ class Prestamo(models.Model):
     fecha_devuelto = models.DateTimeField(blank=True, null=True)
     estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='activo')
     observaciones = models.TextField(blank=True, null=True)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
     
     class Meta:
         verbose_name = "Préstamo"
         verbose_name_plural = "Préstamos"
         ordering = ['-fecha_prestamo']
+        indexes = [
+            # Barrido de vencidos: estado='activo' y fecha_devolucion < hoy
+            models.Index(fields=['estado', 'fecha_devolucion'], name='prestamo_estado_devol_idx'),
+        ]
     
     def __str__(self):
         return f"{self.libro.titulo} - {self.usuario.username}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Estado guardado, para saber si el préstamo entra o sale de 'activo'
+        instance._estado_guardado = instance.__dict__.get('estado')
+        return instance
+    
     def save(self, *args, **kwargs):
-        if self.estado == 'devuelto' and not self.fecha_devuelto:
-            self.fecha_devuelto = timezone.now()
-            self.libro.estado = 'disponible'
-            self.libro.save()
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            if self.estado == 'devuelto' and not self.fecha_devuelto:
+                self.fecha_devuelto = timezone.now()
+                self.libro.estado = 'disponible'
+                self.libro.save()
+            super().save(*args, **kwargs)
+            
+            anterior = getattr(self, '_estado_guardado', None)
+            delta = (self.estado == 'activo') - (anterior == 'activo')
+            PerfilUsuario.ajustar_prestamos_activos(self.usuario_id, delta)
+            self._estado_guardado = self.estado
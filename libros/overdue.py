@@ -0,0 +1,53 @@
+"""Marcado de préstamos vencidos con UPDATE por bloques.
+
+Cada bloque lee con bloqueo los ids de préstamos activos cuya fecha de
+devolución ya pasó (índice ``prestamo_estado_devol_idx``), los pasa a
+``vencido`` con un único UPDATE, ajusta los contadores de los perfiles y deja un
+solo registro de auditoría con los ids del bloque.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from auditoria.buffer import add_audit_log
+from auditoria.models import AuditLog
+from usuarios.models import PerfilUsuario
+
+from .models import Prestamo
+
+OVERDUE_CHUNK_SIZE = 5000
+
+
+def mark_overdue(today=None, chunk_size=OVERDUE_CHUNK_SIZE):
+    """Pasar a ``vencido`` los préstamos activos con ``fecha_devolucion < today``.
+
+    Devuelve el número de préstamos marcados.
+    """
+    today = today or timezone.localdate()
+    queryset = Prestamo.objects.filter(estado='activo', fecha_devolucion__lt=today)
+
+    marked = 0
+    while True:
+        with transaction.atomic():
+            # Los marcados salen del filtro: cada bloque vuelve a empezar por el
+            # principio. Sin ORDER BY, para leer del índice sin ordenar los restantes
+            chunk = list(
+                queryset.select_for_update().order_by().values_list('pk', 'usuario_id')[:chunk_size]
+            )
+            if not chunk:
+                return marked
+
+            ids = [pk for pk, _ in chunk]
+            Prestamo.objects.filter(pk__in=ids).update(estado='vencido', fecha_actualizacion=timezone.now())
+
+            deltas = {}
+            for _, usuario_id in chunk:
+                deltas[usuario_id] = deltas.get(usuario_id, 0) - 1
+            PerfilUsuario.ajustar_prestamos_activos_en_bloque(deltas)
+
+            add_audit_log(AuditLog(
+                action='UPDATE',
+                object_type='Prestamo',
+                object_repr=f'{len(ids)} préstamos vencidos',
+                changes={'estado': {'old': 'activo', 'new': 'vencido'}, 'prestamos': ids},
+            ))
+        marked += len(ids)
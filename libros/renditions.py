@@ -0,0 +1,141 @@
+"""Miniaturas de ``Libro.portada`` generadas bajo demanda.
+
+Cada portada se identifica por el SHA-256 de su contenido (``portada_hash``).
+Las miniaturas se guardan en ``LIBROS_RENDITIONS_DIR/<hash[:2]>/<hash>/`` como
+``<tamaño>.<formato>``: la primera petición las genera con Pillow y las
+siguientes leen el fichero. Como la URL incluye el hash, su contenido nunca
+cambia y se sirve con caché de larga duración; al cambiar la portada se borran
+las miniaturas del hash anterior.
+"""
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from PIL import Image, ImageOps, UnidentifiedImageError
+from rest_framework.exceptions import ValidationError
+
+# Lado máximo (px) de cada tamaño; se conserva la proporción
+SIZES = {
+    'thumb': 160,
+    'small': 320,
+    'medium': 640,
+}
+
+FORMATS = {
+    'webp': ('WEBP', 'image/webp'),
+    'jpeg': ('JPEG', 'image/jpeg'),
+}
+
+QUALITY = 82
+
+_HASH_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+def renditions_dir():
+    return Path(getattr(settings, 'LIBROS_RENDITIONS_DIR', Path(settings.MEDIA_ROOT) / 'renditions'))
+
+
+def rendition_path(source_hash, size, fmt):
+    if not _HASH_RE.match(source_hash) or size not in SIZES or fmt not in FORMATS:
+        raise ValueError('Miniatura no válida')
+    return renditions_dir() / source_hash[:2] / source_hash / f'{size}.{fmt}'
+
+
+def hash_file(field_file):
+    """SHA-256 del contenido de un ``FieldFile`` (subido o ya guardado)"""
+    digest = hashlib.sha256()
+    if getattr(field_file, '_committed', True):
+        with field_file.storage.open(field_file.name, 'rb') as stream:
+            for chunk in iter(lambda: stream.read(64 * 1024), b''):
+                digest.update(chunk)
+    else:
+        # Fichero recién subido: se lee antes de que el campo lo guarde
+        stream = field_file.file
+        stream.seek(0)
+        for chunk in iter(lambda: stream.read(64 * 1024), b''):
+            digest.update(chunk)
+        stream.seek(0)
+    return digest.hexdigest()
+
+
+def render(source, size, fmt):
+    """Imagen reducida de ``source`` (fichero abierto) y su formato Pillow"""
+    image = Image.open(source)
+    image = ImageOps.exif_transpose(image)
+    pil_format, _ = FORMATS[fmt]
+    if pil_format == 'JPEG' or image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGB' if pil_format == 'JPEG' else 'RGBA')
+    image.thumbnail((SIZES[size], SIZES[size]), Image.Resampling.LANCZOS)
+    return image, pil_format
+
+
+def get_or_create_rendition(source_hash, size, fmt, open_source):
+    """Ruta de la miniatura, generándola si no existe.
+
+    ``open_source`` devuelve la portada original abierta en binario, o
+    ``None`` si ningún libro la tiene; solo se llama si hay que generarla.
+    Devuelve ``None`` si la portada no existe; si no es una imagen o supera
+    ``Image.MAX_IMAGE_PIXELS`` lanza ``ValidationError`` (400).
+    """
+    path = rendition_path(source_hash, size, fmt)
+    if path.exists():
+        return path
+
+    try:
+        source = open_source()
+        if source is None:
+            return None
+        with source:
+            image, pil_format = render(source, size, fmt)
+    except FileNotFoundError:
+        return None
+    except (UnidentifiedImageError, Image.DecompressionBombError):
+        raise ValidationError({'portada': 'La portada no es una imagen válida o es demasiado grande'})
+
+    # Temporal + rename: una petición simultánea nunca lee un fichero a medias
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            image.save(tmp, pil_format, quality=QUALITY)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return path
+
+
+def purge_renditions(source_hash):
+    """Borrar todas las miniaturas de una portada"""
+    if _HASH_RE.match(source_hash or ''):
+        shutil.rmtree(renditions_dir() / source_hash[:2] / source_hash, ignore_errors=True)
+
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def parse_range(header, length):
+    """``(inicio, fin)`` inclusivos de un ``Range`` de un solo tramo.
+
+    Devuelve ``None`` si no hay cabecera o no se entiende (se sirve entero) y
+    lanza ``ValueError`` si el tramo no es satisfacible.
+    """
+    match = _RANGE_RE.match((header or '').strip())
+    if not match:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        # bytes=-N: los últimos N bytes
+        start, end = max(length - int(end), 0), length - 1
+    else:
+        start = int(start)
+        end = min(int(end), length - 1) if end else length - 1
+    if start >= length or start > end:
+        raise ValueError('Rango no satisfacible')
+    return start, end
@@ -0,0 +1,189 @@
+"""Índice de texto completo del catálogo.
+
+El índice vive en la tabla ``libros_libro_fts`` (título, descripción,
+editorial y nombre del autor, con el id del libro como clave) y se mantiene
+desde las señales de Libro y Autor. En SQLite es una tabla virtual FTS5
+ordenada con bm25; en MySQL una tabla InnoDB con índice FULLTEXT. En otros
+motores la búsqueda recurre a ``icontains``.
+"""
+import re
+
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.models import Q
+
+FTS_TABLE = 'libros_libro_fts'
+
+# Peso de cada columna en la relevancia (título, descripción, editorial, autor)
+COLUMN_WEIGHTS = (10.0, 1.0, 2.0, 5.0)
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _document(libro):
+    autor = libro.autor
+    return [
+        libro.titulo,
+        libro.descripcion or '',
+        libro.editorial or '',
+        f'{autor.nombre} {autor.apellido}',
+    ]
+
+
+def _within_clause(column, within):
+    """Condición ``AND column IN (subconsulta)`` para un ``(sql, params)`` o nada"""
+    if within is None:
+        return '', ()
+    sql, params = within
+    return f' AND {column} IN ({sql})', params
+
+
+class SQLiteFTS5Backend:
+    def create_table(self, schema_editor):
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            "titulo, descripcion, editorial, autor, "
+            "tokenize = 'unicode61 remove_diacritics 2')"
+        )
+
+    def drop_table(self, schema_editor):
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+    def index(self, cursor, libros):
+        ids = [(libro.pk,) for libro in libros]
+        cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', ids)
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (rowid, titulo, descripcion, editorial, autor) '
+            'VALUES (%s, %s, %s, %s, %s)',
+            [[libro.pk, *_document(libro)] for libro in libros]
+        )
+
+    def remove(self, cursor, ids):
+        cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(pk,) for pk in ids])
+
+    def search(self, cursor, words, limit, within=None):
+        # Cada palabra como prefijo entre comillas: la entrada del usuario
+        # nunca se interpreta como sintaxis de FTS5
+        match = ' '.join('"{}"*'.format(word.replace('"', '""')) for word in words)
+        weights = ', '.join(str(weight) for weight in COLUMN_WEIGHTS)
+        where, params = _within_clause('rowid', within)
+        cursor.execute(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s{where} '
+            f'ORDER BY bm25({FTS_TABLE}, {weights}) LIMIT %s',
+            [match, *params, limit]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+class MySQLFulltextBackend:
+    columns = 'titulo, descripcion, editorial, autor'
+
+    def create_table(self, schema_editor):
+        schema_editor.execute(
+            f'CREATE TABLE IF NOT EXISTS {FTS_TABLE} ('
+            'libro_id BIGINT NOT NULL PRIMARY KEY, '
+            'titulo VARCHAR(200) NOT NULL, descripcion LONGTEXT NOT NULL, '
+            'editorial VARCHAR(100) NOT NULL, autor VARCHAR(201) NOT NULL, '
+            f'FULLTEXT KEY {FTS_TABLE}_idx ({self.columns})'
+            ') ENGINE=InnoDB'
+        )
+
+    def drop_table(self, schema_editor):
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+    def index(self, cursor, libros):
+        cursor.executemany(
+            f'REPLACE INTO {FTS_TABLE} (libro_id, {self.columns}) VALUES (%s, %s, %s, %s, %s)',
+            [[libro.pk, *_document(libro)] for libro in libros]
+        )
+
+    def remove(self, cursor, ids):
+        cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE libro_id = %s', [(pk,) for pk in ids])
+
+    def search(self, cursor, words, limit, within=None):
+        # El título pesa más repitiendo su MATCH en la puntuación
+        query = ' '.join(f'{word}*' for word in words)
+        where, params = _within_clause('libro_id', within)
+        cursor.execute(
+            f'SELECT libro_id, '
+            f'MATCH({self.columns}) AGAINST (%s IN BOOLEAN MODE) '
+            f'+ MATCH(titulo) AGAINST (%s IN BOOLEAN MODE) AS score '
+            f'FROM {FTS_TABLE} WHERE MATCH({self.columns}) AGAINST (%s IN BOOLEAN MODE){where} '
+            f'ORDER BY score DESC LIMIT %s',
+            [query, query, query, *params, limit]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+BACKENDS = {
+    'sqlite': SQLiteFTS5Backend,
+    'mysql': MySQLFulltextBackend,
+}
+
+
+def get_backend(conn=None):
+    backend = BACKENDS.get((conn or connection).vendor)
+    return backend() if backend else None
+
+
+def create_index_table(schema_editor):
+    backend = get_backend(schema_editor.connection)
+    if backend:
+        backend.create_table(schema_editor)
+
+
+def drop_index_table(schema_editor):
+    backend = get_backend(schema_editor.connection)
+    if backend:
+        backend.drop_table(schema_editor)
+
+
+def index_libros(libros, using=DEFAULT_DB_ALIAS):
+    """Añadir o actualizar libros en el índice (con ``autor`` cargado)"""
+    conn = connections[using]
+    backend = get_backend(conn)
+    libros = list(libros)
+    if backend and libros:
+        with conn.cursor() as cursor:
+            backend.index(cursor, libros)
+
+
+def remove_libros(ids, using=DEFAULT_DB_ALIAS):
+    conn = connections[using]
+    backend = get_backend(conn)
+    ids = list(ids)
+    if backend and ids:
+        with conn.cursor() as cursor:
+            backend.remove(cursor, ids)
+
+
+def search_libros(queryset, query, limit=20):
+    """Libros de ``queryset`` que coinciden con ``query``, por relevancia.
+
+    El índice se consulta en la misma base que ``queryset`` (la réplica en
+    las lecturas de la API).
+    """
+    words = _WORD_RE.findall(query)
+    if not words:
+        return []
+
+    conn = connections[queryset.db]
+    backend = get_backend(conn)
+    if backend is None:
+        condition = Q()
+        for word in words:
+            condition &= (
+                Q(titulo__icontains=word) | Q(descripcion__icontains=word)
+                | Q(editorial__icontains=word) | Q(autor__nombre__icontains=word)
+                | Q(autor__apellido__icontains=word)
+            )
+        return list(queryset.filter(condition).order_by('titulo')[:limit])
+
+    # Los filtros del catálogo van dentro de la consulta del índice: el LIMIT
+    # se aplica a los libros que ya los cumplen
+    within = None
+    if queryset.query.where:
+        within = queryset.order_by().values('pk').query.get_compiler(connection=conn).as_sql()
+    with conn.cursor() as cursor:
+        ids = backend.search(cursor, words, limit, within)
+    libros = queryset.in_bulk(ids)
+    return [libros[pk] for pk in ids if pk in libros]
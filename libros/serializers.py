@@ -1,6 +1,8 @@
 from rest_framework import serializers
 from .models import Autor, Genero, Libro, Prestamo
 from django.contrib.auth.models import User
+from django.urls import reverse
+from .renditions import FORMATS, SIZES
 
 class AutorSerializer(serializers.ModelSerializer):
     class Meta:
@@ -15,10 +17,26 @@ class GeneroSerializer(serializers.ModelSerializer):
 class LibroSerializer(serializers.ModelSerializer):
     autor_nombre = serializers.CharField(source='autor.__str__', read_only=True)
     genero_nombre = serializers.CharField(source='genero.nombre', read_only=True)
+    portadas = serializers.SerializerMethodField()
     
     class Meta:
         model = Libro
         fields = '__all__'
+    
+    def get_portadas(self, obj):
+        """URLs de las miniaturas de la portada por tamaño y formato"""
+        if not obj.portada_hash:
+            return None
+        request = self.context.get('request')
+        portadas = {}
+        for size in SIZES:
+            portadas[size] = {}
+            for formato in FORMATS:
+                url = reverse('portada-rendition', kwargs={
+                    'portada_hash': obj.portada_hash, 'size': size, 'formato': formato
+                })
+                portadas[size][formato] = request.build_absolute_uri(url) if request else url
+        return portadas
 
 class PrestamoSerializer(serializers.ModelSerializer):
     libro_titulo = serializers.CharField(source='libro.titulo', read_only=True)
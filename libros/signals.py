@@ -0,0 +1,48 @@
+from django.db.models.signals import post_save, post_delete
+from django.db import transaction
+from django.dispatch import receiver
+from .caching import bump_version
+from usuarios.models import PerfilUsuario
+from .models import Autor, Genero, Libro, Prestamo
+from .renditions import purge_renditions
+from .search import index_libros, remove_libros
+
+@receiver(post_save, sender=Libro)
+def indexar_libro(sender, instance, using, **kwargs):
+    """Mantener el índice de búsqueda al crear o editar un libro"""
+    index_libros([instance], using=using)
+
+@receiver(post_delete, sender=Libro)
+def desindexar_libro(sender, instance, using, **kwargs):
+    remove_libros([instance.pk], using=using)
+
+@receiver(post_save, sender=Autor)
+def reindexar_libros_autor(sender, instance, created, using, **kwargs):
+    """El nombre del autor forma parte del documento de sus libros"""
+    if not created:
+        index_libros(instance.libros.using(using).select_related('autor'), using=using)
+
+
+@receiver(post_delete, sender=Prestamo)
+def descontar_prestamo_activo(sender, instance, **kwargs):
+    """Borrar un préstamo activo libera un hueco en el límite del usuario"""
+    if getattr(instance, '_estado_guardado', instance.estado) == 'activo':
+        PerfilUsuario.ajustar_prestamos_activos(instance.usuario_id, -1)
+
+@receiver(post_save, sender=Autor)
+@receiver(post_save, sender=Genero)
+@receiver(post_save, sender=Libro)
+@receiver(post_delete, sender=Autor)
+@receiver(post_delete, sender=Genero)
+@receiver(post_delete, sender=Libro)
+def invalidar_cache_catalogo(sender, **kwargs):
+    """Las respuestas cacheadas que dependen del modelo dejan de usarse"""
+    # Tras el commit: antes, una lectura concurrente guardaría los datos
+    # antiguos con el sello nuevo
+    transaction.on_commit(lambda: bump_version(sender))
+
+@receiver(post_delete, sender=Libro)
+def purgar_miniaturas_portada(sender, instance, **kwargs):
+    """Las miniaturas de la portada sobran si ningún otro libro la usa"""
+    if instance.portada_hash and not Libro.objects.filter(portada_hash=instance.portada_hash).exists():
+        transaction.on_commit(lambda: purge_renditions(instance.portada_hash))
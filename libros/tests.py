@@ -1,3 +1,785 @@
-from django.test import TestCase
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import pytest
+from datetime import date
+from io import StringIO
+from unittest import mock, skipUnless
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import QuerySet
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.http import http_date
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+from auditoria.models import AuditLog
+from usuarios.models import PerfilUsuario
+from .bulk import bulk_prestar
+from .filters import facet_counts, filter_libros
+from .models import Autor, Genero, Libro, Prestamo
 
-# Create your tests here.
+@pytest.mark.django_db
+class TestPaginacionCursor(APITestCase):
+    """Pruebas de la paginación por cursor del catálogo"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='lector', password='testpass123')
+        PerfilUsuario.objects.create(user=self.user, tipo_usuario='premium')
+        self.client.force_authenticate(self.user)
+
+        autor = Autor.objects.create(nombre='Isabel', apellido='Allende')
+        Libro.objects.bulk_create([
+            Libro(titulo=f'Libro {i}', autor=autor, isbn=f'{i:013d}', anio_publicacion=2000)
+            for i in range(45)
+        ])
+
+    def test_recorrer_catalogo_con_cursor(self):
+        """Test: Los cursores recorren todo el catálogo sin COUNT ni repetidos"""
+        ids = []
+        url = '/api/libros/libros/'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            ids.extend(libro['id'] for libro in response.data['results'])
+            url = response.data['next']
+
+        self.assertEqual(len(ids), 45)
+        self.assertEqual(len(set(ids)), 45)
+
+    def test_paginacion_por_numero_opcional(self):
+        """Test: ?page= mantiene la paginación por número de página"""
+        response = self.client.get('/api/libros/libros/', {'page': 3})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 45)
+        self.assertEqual(len(response.data['results']), 5)
+
+
+@pytest.mark.django_db
+class TestBusquedaCatalogo(APITestCase):
+    """Pruebas de la búsqueda de texto completo del catálogo"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='lector', password='testpass123')
+        PerfilUsuario.objects.create(user=self.user, tipo_usuario='premium')
+        self.client.force_authenticate(self.user)
+
+        self.autor = Autor.objects.create(nombre='Gabriel', apellido='García Márquez')
+        otro = Autor.objects.create(nombre='Julio', apellido='Cortázar')
+        self.cien_anios = Libro.objects.create(
+            titulo='Cien años de soledad', autor=self.autor, isbn='9780307350454',
+            anio_publicacion=1967, descripcion='La historia de la familia Buendía en Macondo'
+        )
+        self.rayuela = Libro.objects.create(
+            titulo='Rayuela', autor=otro, isbn='9788437604572', anio_publicacion=1963,
+            descripcion='Una novela que menciona la soledad de pasada'
+        )
+
+    def buscar(self, q):
+        response = self.client.get('/api/libros/libros/search/', {'q': q})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [libro['id'] for libro in response.data['results']]
+
+    def test_busqueda_ordenada_por_relevancia(self):
+        """Test: Una coincidencia en el título pesa más que en la descripción"""
+        self.assertEqual(self.buscar('soledad'), [self.cien_anios.id, self.rayuela.id])
+
+    def test_busqueda_por_autor_sin_acentos(self):
+        """Test: Se busca por nombre de autor, por prefijo e ignorando acentos"""
+        self.assertEqual(self.buscar('garcia marq'), [self.cien_anios.id])
+
+    def test_indice_sincronizado_por_senales(self):
+        """Test: Editar un libro o su autor actualiza el índice"""
+        self.cien_anios.titulo = 'El otoño del patriarca'
+        self.cien_anios.save()
+        self.assertEqual(self.buscar('patriarca'), [self.cien_anios.id])
+
+        self.autor.apellido = 'Márquez'
+        self.autor.nombre = 'Gabo'
+        self.autor.save()
+        self.assertEqual(self.buscar('gabo'), [self.cien_anios.id])
+
+        self.rayuela.delete()
+        self.assertEqual(self.buscar('rayuela'), [])
+
+    def test_filtros_antes_del_limite(self):
+        """Test: Los filtros del catálogo se aplican antes del límite de resultados"""
+        genero = Genero.objects.create(nombre='Cuento')
+        self.rayuela.genero = genero
+        self.rayuela.save()
+
+        response = self.client.get('/api/libros/libros/search/', {'q': 'soledad', 'limit': 1, 'genero': genero.id})
+        self.assertEqual([libro['id'] for libro in response.data['results']], [self.rayuela.id])
+
+    def test_busqueda_sin_consulta(self):
+        """Test: La búsqueda requiere el parámetro q"""
+        response = self.client.get('/api/libros/libros/search/', {'q': '  '})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.buscar('"OR*'), [])
+
+
+@pytest.mark.django_db
+class TestFiltrosCatalogo(APITestCase):
+    """Pruebas de los filtros y las facetas del listado de libros"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='lector', password='testpass123')
+        PerfilUsuario.objects.create(user=self.user, tipo_usuario='premium')
+        self.client.force_authenticate(self.user)
+
+        autor = Autor.objects.create(nombre='Jorge Luis', apellido='Borges')
+        self.cuento = Genero.objects.create(nombre='Cuento')
+        self.ensayo = Genero.objects.create(nombre='Ensayo')
+        datos = [
+            (self.cuento, 'disponible', 'Español', 1944),
+            (self.cuento, 'prestado', 'Español', 1949),
+            (self.cuento, 'disponible', 'Inglés', 1962),
+            (self.ensayo, 'disponible', 'Español', 1952),
+        ]
+        Libro.objects.bulk_create([
+            Libro(titulo=f'Libro {i}', autor=autor, genero=genero, estado=estado,
+                  idioma=idioma, anio_publicacion=anio, isbn=f'{i:013d}')
+            for i, (genero, estado, idioma, anio) in enumerate(datos)
+        ])
+
+    def test_filtros_y_rango_de_anios(self):
+        """Test: Los filtros por género, estado y rango de años se combinan"""
+        response = self.client.get('/api/libros/libros/', {
+            'genero': self.cuento.id, 'estado': 'disponible', 'anio_desde': 1940, 'anio_hasta': 1950
+        })
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([libro['anio_publicacion'] for libro in response.data['results']], [1944])
+
+    def test_facetas_en_una_consulta(self):
+        """Test: Las facetas del listado salen de una sola consulta agrupada"""
+        queryset = filter_libros(Libro.objects.all(), {'idioma': 'Español'})
+        with self.assertNumQueries(1):
+            facetas = facet_counts(queryset)
+
+        self.assertEqual(facetas['genero'], [
+            {'id': self.cuento.id, 'nombre': 'Cuento', 'total': 2},
+            {'id': self.ensayo.id, 'nombre': 'Ensayo', 'total': 1},
+        ])
+        self.assertEqual(facetas['estado'], [
+            {'valor': 'disponible', 'total': 2}, {'valor': 'prestado', 'total': 1}
+        ])
+        self.assertEqual(facetas['idioma'], [{'valor': 'Español', 'total': 3}])
+        self.assertEqual(facetas['decada'], [
+            {'valor': 1940, 'total': 2}, {'valor': 1950, 'total': 1}
+        ])
+
+    def test_listado_incluye_facetas(self):
+        """Test: La respuesta del listado incluye las facetas del filtro"""
+        response = self.client.get('/api/libros/libros/', {'estado': 'disponible'})
+
+        self.assertEqual(response.data['facets']['estado'], [{'valor': 'disponible', 'total': 3}])
+
+    def test_filtro_invalido(self):
+        """Test: Filtros con valores inválidos devuelven 400"""
+        response = self.client.get('/api/libros/libros/', {'anio_desde': 'mil'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get('/api/libros/libros/', {'estado': 'perdido'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@pytest.mark.django_db
+class TestCacheCatalogo(APITestCase):
+    """Pruebas de la caché de respuestas del catálogo"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='lector', password='testpass123')
+        PerfilUsuario.objects.create(user=self.user, tipo_usuario='premium')
+        self.client.force_authenticate(self.user)
+
+        self.autor = Autor.objects.create(nombre='Ernesto', apellido='Sabato')
+        self.libro = Libro.objects.create(
+            titulo='El túnel', autor=self.autor, isbn='9788432248238', anio_publicacion=1948
+        )
+
+    def test_lectura_repetida_sin_consultas(self):
+        """Test: La segunda lectura solo hace, en libros, la consulta de la ETag"""
+        lecturas = {
+            '/api/libros/libros/': 1,
+            f'/api/libros/libros/{self.libro.id}/': 1,
+            '/api/libros/autores/': 0,
+        }
+        for url, consultas in lecturas.items():
+            primera = self.client.get(url)
+            with self.assertNumQueries(consultas):
+                segunda = self.client.get(url)
+            self.assertEqual(segunda.data, primera.data)
+
+    def test_parametros_en_la_clave(self):
+        """Test: Parámetros distintos no comparten la entrada de caché"""
+        self.client.get('/api/libros/libros/', {'estado': 'disponible'})
+        response = self.client.get('/api/libros/libros/', {'estado': 'prestado'})
+
+        self.assertEqual(response.data['results'], [])
+
+    def test_invalidacion_por_senales(self):
+        """Test: Guardar o borrar un modelo invalida las respuestas que lo incluyen"""
+        url = f'/api/libros/libros/{self.libro.id}/'
+        self.client.get(url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.autor.apellido = 'Sábato'
+            self.autor.save()
+        self.assertEqual(self.client.get(url).data['autor_nombre'], 'Ernesto Sábato')
+
+        self.client.get('/api/libros/autores/')
+        with self.captureOnCommitCallbacks(execute=True):
+            Autor.objects.create(nombre='Silvina', apellido='Ocampo')
+        self.assertEqual(len(self.client.get('/api/libros/autores/').data['results']), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.libro.delete()
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+
+@pytest.mark.django_db
+class TestGetCondicional(APITestCase):
+    """Pruebas del GET condicional por ETag en libros y préstamos"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='lector', password='testpass123')
+        PerfilUsuario.objects.create(user=self.user, tipo_usuario='premium')
+        self.client.force_authenticate(self.user)
+
+        self.autor = Autor.objects.create(nombre='Alejo', apellido='Carpentier')
+        self.libro = Libro.objects.create(
+            titulo='El reino de este mundo', autor=self.autor, isbn='9788420633121', anio_publicacion=1949
+        )
+        self.prestamo = Prestamo.objects.create(
+            libro=self.libro, usuario=self.user, fecha_devolucion=date(2030, 1, 1)
+        )
+
+    def test_304_sin_serializar(self):
+        """Test: If-None-Match coincidente devuelve 304 con una sola consulta"""
+        for url in ['/api/libros/libros/', f'/api/libros/libros/{self.libro.id}/',
+                    '/api/libros/prestamos/', f'/api/libros/prestamos/{self.prestamo.id}/']:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+            with self.assertNumQueries(1):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=response.headers['ETag'])
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(response.content, b'')
+
+    def test_sin_last_modified(self):
+        """Test: Se valida solo por ETag: renombrar el autor no da un 304 falso en el detalle"""
+        url = f'/api/libros/libros/{self.libro.id}/'
+        response = self.client.get(url)
+        self.assertNotIn('Last-Modified', response.headers)
+        self.assertNotIn('Last-Modified', self.client.get('/api/libros/libros/').headers)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.autor.apellido = 'Carpentier y Valmont'
+            self.autor.save()
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['autor_nombre'], 'Alejo Carpentier y Valmont')
+
+    def test_listado_tras_borrar(self):
+        """Test: Borrar un libro no da un 304 falso en el listado"""
+        url = '/api/libros/libros/'
+        Libro.objects.create(titulo='Los pasos perdidos', autor=self.autor, isbn='9788420633138',
+                             anio_publicacion=1953)
+        self.client.get(url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Libro.objects.filter(isbn='9788420633138').delete()
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_pk_no_numerico(self):
+        """Test: Un pk no numérico en el detalle devuelve 404"""
+        for url in ['/api/libros/libros/abc/', '/api/libros/prestamos/abc/']:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_etag_cambia_con_los_datos(self):
+        """Test: Editar, borrar o cambiar el autor cambia la ETag"""
+        url = '/api/libros/libros/'
+        etag = self.client.get(url).headers['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.autor.apellido = 'Carpentier y Valmont'
+            self.autor.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['autor_nombre'], 'Alejo Carpentier y Valmont')
+
+        etag = response.headers['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Libro.objects.create(titulo='Los pasos perdidos', autor=self.autor, isbn='9788420633138',
+                                 anio_publicacion=1953)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 2)
+
+
+class TestPrestamoConcurrente(TransactionTestCase):
+    """Pruebas de préstamos simultáneos con hilos contra la base de datos de pruebas"""
+
+    def setUp(self):
+        autor = Autor.objects.create(nombre='Juan', apellido='Rulfo')
+        self.libro = Libro.objects.create(
+            titulo='Pedro Páramo', autor=autor, isbn='9788437604183', anio_publicacion=1955
+        )
+        self.usuarios = [
+            User.objects.create_user(username=f'lector{i}', password='testpass123') for i in range(6)
+        ]
+        for usuario in self.usuarios:
+            PerfilUsuario.objects.create(user=usuario, tipo_usuario='premium')
+
+    def tearDown(self):
+        # Borrar con el ORM para que las señales limpien el índice de búsqueda
+        Libro.objects.all().delete()
+
+    def prestar_a_la_vez(self, peticiones):
+        """Lanzar a la vez un préstamo por cada ``(usuario, libro)``"""
+        barrera = threading.Barrier(len(peticiones))
+        codigos = []
+
+        def prestar(usuario, libro):
+            client = APIClient()
+            client.force_authenticate(usuario)
+            try:
+                barrera.wait()
+                codigos.append(client.post(
+                    f'/api/libros/libros/{libro.id}/prestar/',
+                    {'libro': libro.id, 'fecha_devolucion': '2030-01-01'}
+                ).status_code)
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=prestar, args=peticion) for peticion in peticiones]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        return sorted(codigos)
+
+    def test_un_solo_prestamo_por_ejemplar(self):
+        """Test: Peticiones simultáneas por el mismo libro: un 201 y el resto 409"""
+        codigos = self.prestar_a_la_vez([(usuario, self.libro) for usuario in self.usuarios])
+
+        self.assertEqual(codigos, [201] + [409] * (len(self.usuarios) - 1))
+        self.assertEqual(Prestamo.objects.filter(libro=self.libro).count(), 1)
+        self.libro.refresh_from_db()
+        self.assertEqual(self.libro.estado, 'prestado')
+        self.assertEqual(AuditLog.objects.filter(action='PRESTAMO', object_id=self.libro.id).count(), 1)
+
+    def test_limite_con_peticiones_simultaneas(self):
+        """Test: Un usuario no supera su límite aunque pida varios libros a la vez"""
+        usuario = self.usuarios[0]
+        perfil = usuario.perfil
+        perfil.tipo_usuario = 'gratuito'
+        perfil.save()
+        libros = [
+            Libro.objects.create(titulo=f'Cuento {i}', autor=self.libro.autor, isbn=f'{i:013d}',
+                                 anio_publicacion=1953)
+            for i in range(5)
+        ]
+
+        codigos = self.prestar_a_la_vez([(usuario, libro) for libro in libros])
+
+        self.assertEqual(codigos, [201] * 3 + [400] * 2)
+        self.assertEqual(usuario.prestamos.filter(estado='activo').count(), 3)
+
+
+@pytest.mark.django_db
+class TestPrestamosEnBloque(APITestCase):
+    """Pruebas de los préstamos y devoluciones en bloque"""
+
+    def setUp(self):
+        self.bibliotecario = User.objects.create_user(username='bibliotecario', password='testpass123')
+        PerfilUsuario.objects.create(user=self.bibliotecario, tipo_usuario='bibliotecario')
+        self.client.force_authenticate(self.bibliotecario)
+
+        self.lectores = User.objects.bulk_create([User(username=f'lector{i}') for i in range(5)])
+        PerfilUsuario.objects.bulk_create([
+            PerfilUsuario(user=lector, limite_prestamos=10) for lector in self.lectores
+        ])
+        autor = Autor.objects.create(nombre='Horacio', apellido='Quiroga')
+        self.libros = Libro.objects.bulk_create([
+            Libro(titulo=f'Cuento {i}', autor=autor, isbn=f'{i:013d}', anio_publicacion=1917)
+            for i in range(50)
+        ])
+
+    def prestar_todos(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/api/libros/prestamos/bulk_prestar/', {'prestamos': [
+                {'libro': libro.id, 'usuario': self.lectores[i % 5].id, 'fecha_devolucion': '2030-01-01'}
+                for i, libro in enumerate(self.libros)
+            ]}, format='json')
+
+    def test_prestar_en_bloque(self):
+        """Test: Un lote de préstamos crea los préstamos, ocupa los libros y suma contadores"""
+        response = self.prestar_todos()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['procesados'], 50)
+        self.assertFalse(Libro.objects.filter(estado='disponible').exists())
+        self.assertEqual(
+            sorted(PerfilUsuario.objects.filter(user__in=self.lectores).values_list('prestamos_activos', flat=True)),
+            [10] * 5
+        )
+        self.assertEqual(AuditLog.objects.filter(action='PRESTAMO').count(), 50)
+
+    def test_prestar_sin_claves_del_bulk_create(self):
+        """Test: Sin claves devueltas por el INSERT (MySQL) se leen los préstamos creados"""
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert',
+                               new_callable=mock.PropertyMock, return_value=False):
+            response = self.prestar_todos()
+
+        self.assertEqual(response.data['procesados'], 50)
+        prestamos = dict(Prestamo.objects.values_list('libro_id', 'id'))
+        for resultado in response.data['resultados']:
+            self.assertEqual(resultado['prestamo'], prestamos[resultado['libro']])
+        self.assertEqual(
+            sorted(log.changes['prestamo'] for log in AuditLog.objects.filter(action='PRESTAMO')),
+            sorted(prestamos.values())
+        )
+
+    def test_bloquea_perfiles_antes_que_libros(self):
+        """Test: El lote bloquea perfiles y luego libros, como el préstamo individual"""
+        items = [{'libro': self.libros[0].id, 'usuario': self.lectores[0].id, 'fecha_devolucion': '2030-01-01'}]
+        with CaptureQueriesContext(connection) as queries:
+            bulk_prestar(items, self.bibliotecario)
+
+        lecturas = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('SELECT')]
+        self.assertIn('FROM "usuarios_perfilusuario"', lecturas[0])
+        self.assertIn('FROM "libros_libro"', lecturas[1])
+
+    def test_resultados_por_elemento(self):
+        """Test: Los elementos inválidos se informan uno a uno sin abortar el lote"""
+        libro = self.libros[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/libros/prestamos/bulk_prestar/', {'prestamos': [
+                {'libro': libro.id, 'usuario': self.lectores[0].id, 'fecha_devolucion': '2030-01-01'},
+                {'libro': libro.id, 'usuario': self.lectores[1].id, 'fecha_devolucion': '2030-01-01'},
+                {'libro': 999999, 'usuario': self.lectores[1].id, 'fecha_devolucion': '2030-01-01'},
+                {'libro': self.libros[1].id, 'usuario': self.lectores[1].id},
+            ]}, format='json')
+
+        self.assertEqual(response.data['procesados'], 1)
+        self.assertEqual([resultado['ok'] for resultado in response.data['resultados']], [True, False, False, False])
+        self.assertEqual(response.data['resultados'][1]['error'], 'El libro no está disponible')
+        self.assertIn('fecha_devolucion', response.data['resultados'][3]['error'])
+
+    def test_devolver_50_libros_con_pocas_consultas(self):
+        """Test: Devolver 50 libros es una petición con un número fijo de consultas"""
+        self.prestar_todos()
+        ids = list(Prestamo.objects.values_list('id', flat=True))
+
+        # Lectura con bloqueo + UPDATE de préstamos, de libros y de contadores
+        # + INSERT de auditoría, y el SAVEPOINT/RELEASE de la transacción
+        with self.assertNumQueries(7), self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/libros/prestamos/bulk_devolver/', {'prestamos': ids + [ids[0]]},
+                                        format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['procesados'], 50)
+        self.assertEqual(response.data['resultados'][-1]['error'], 'El préstamo no está activo')
+        self.assertFalse(Prestamo.objects.filter(estado='activo').exists())
+        self.assertFalse(Libro.objects.exclude(estado='disponible').exists())
+        self.assertFalse(PerfilUsuario.objects.filter(prestamos_activos__gt=0).exists())
+        self.assertEqual(AuditLog.objects.filter(action='DEVOLUCION').count(), 50)
+
+    def test_solo_bibliotecarios_y_maximo(self):
+        """Test: Los lotes requieren bibliotecario y respetan el máximo de elementos"""
+        with self.settings(PRESTAMOS_BULK_MAX=10):
+            response = self.client.post('/api/libros/prestamos/bulk_devolver/', {'prestamos': list(range(11))},
+                                        format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.client.force_authenticate(self.lectores[0])
+        response = self.client.post('/api/libros/prestamos/bulk_devolver/', {'prestamos': [1]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+@pytest.mark.django_db
+class TestImportacionCatalogo(APITestCase):
+    """Pruebas de la importación masiva del catálogo"""
+
+    CSV = (
+        'titulo,isbn,anio_publicacion,autor_nombre,autor_apellido,genero,idioma\n'
+        'Ficciones,9788420633114,1944,Jorge Luis,Borges,Cuento,\n'
+        'El Aleph,9788420633251,1949,Jorge Luis,Borges,Cuento,\n'
+        'Sobre héroes y tumbas,9788432217937,1961,Ernesto,Sabato,Novela,\n'
+        'Sin año,9788432217938,,Ernesto,Sabato,Novela,\n'
+        'El Aleph (edición revisada),9788420633251,1949,Jorge Luis,Borges,Cuento,\n'
+    )
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(username='admin', password='testpass123', is_staff=True)
+        PerfilUsuario.objects.create(user=self.admin, tipo_usuario='dba')
+        self.client.force_authenticate(self.admin)
+        self.borges = Autor.objects.create(nombre='Jorge Luis', apellido='Borges')
+
+    def importar(self, contenido, nombre='catalogo.csv'):
+        archivo = SimpleUploadedFile(nombre, contenido.encode('utf-8'))
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/api/libros/libros/importar/', {'archivo': archivo}, format='multipart')
+
+    def test_importar_csv(self):
+        """Test: Se reutilizan autores, se crean géneros una vez y se deduplica por ISBN"""
+        response = self.importar(self.CSV)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['leidos'], 5)
+        self.assertEqual(response.data['importados'], 3)
+        self.assertEqual(response.data['duplicados'], 1)
+        self.assertEqual(response.data['invalidos'], 1)
+        self.assertEqual(response.data['errores'], [{'linea': 5, 'error': 'anio_publicacion es obligatorio'}])
+        self.assertEqual(response.data['autores_creados'], 1)
+        self.assertEqual(response.data['generos_creados'], 2)
+
+        self.assertEqual(Autor.objects.filter(apellido='Borges').count(), 1)
+        self.assertEqual(Libro.objects.get(isbn='9788420633251').titulo, 'El Aleph (edición revisada)')
+        self.assertEqual(Libro.objects.filter(autor=self.borges).count(), 2)
+        self.assertEqual(AuditLog.objects.filter(object_repr='Importación de 3 libros').count(), 1)
+
+    def test_actualizar_por_isbn_e_indexar(self):
+        """Test: Reimportar un ISBN actualiza el libro y el índice de búsqueda, sin cambiar su estado"""
+        libro = Libro.objects.create(titulo='Ficciones', autor=self.borges, isbn='9788420633114',
+                                     anio_publicacion=1944, estado='prestado')
+        jsonl = '\n'.join([
+            json.dumps({'titulo': 'Artificios', 'isbn': '9788420633114', 'anio_publicacion': 1944,
+                        'autor_nombre': 'Jorge Luis', 'autor_apellido': 'Borges'}),
+            '{no es json',
+        ])
+
+        response = self.importar(jsonl, 'catalogo.jsonl')
+
+        self.assertEqual(response.data['importados'], 1)
+        self.assertEqual(response.data['invalidos'], 1)
+        libro.refresh_from_db()
+        self.assertEqual(libro.titulo, 'Artificios')
+        self.assertEqual(libro.estado, 'prestado')
+        busqueda = self.client.get('/api/libros/libros/search/', {'q': 'artificios'})
+        self.assertEqual([resultado['id'] for resultado in busqueda.data['results']], [libro.id])
+
+    def test_comando_por_bloques(self):
+        """Test: El comando importa por bloques e informa del rendimiento"""
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', encoding='utf-8', delete=False) as fichero:
+            fichero.write(self.CSV)
+        self.addCleanup(os.remove, fichero.name)
+
+        salida = StringIO()
+        call_command('importar_catalogo', fichero.name, '--chunk-size', '2', stdout=salida)
+
+        # El ISBN repetido cae en otro bloque: se escribe dos veces, la última gana
+        self.assertEqual(Libro.objects.count(), 3)
+        self.assertEqual(Libro.objects.get(isbn='9788420633251').titulo, 'El Aleph (edición revisada)')
+        self.assertIn('2 libros importados (', salida.getvalue())
+        self.assertIn('4 libros importados en', salida.getvalue())
+        self.assertIn('línea 5: anio_publicacion es obligatorio', salida.getvalue())
+
+    def test_mysql_sin_restriccion_del_conflicto(self):
+        """Test: Sin soporte para indicar la restricción (MySQL) no se pasa unique_fields"""
+        llamadas = []
+        original = QuerySet.bulk_create
+
+        def bulk_create(queryset, objs, **kwargs):
+            if queryset.model is not Libro:
+                return original(queryset, objs, **kwargs)
+            # SQLite necesita la restricción: solo se comprueban las opciones
+            llamadas.append(kwargs)
+            return objs
+
+        with mock.patch.object(connection.features, 'supports_update_conflicts_with_target', False), \
+                mock.patch.object(QuerySet, 'bulk_create', bulk_create):
+            self.importar(self.CSV)
+
+        self.assertEqual(len(llamadas), 1)
+        self.assertTrue(llamadas[0]['update_conflicts'])
+        self.assertNotIn('unique_fields', llamadas[0])
+
+    @override_settings(LIBROS_IMPORT_MAX_UPLOAD_BYTES=100)
+    def test_fichero_demasiado_grande(self):
+        """Test: El endpoint rechaza ficheros mayores que el límite y remite al comando"""
+        response = self.importar(self.CSV)
+
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.assertIn('importar_catalogo', response.data['error'])
+        self.assertFalse(Libro.objects.exists())
+
+    def test_solo_administradores(self):
+        """Test: Solo los administradores pueden importar"""
+        lector = User.objects.create_user(username='lector', password='testpass123')
+        PerfilUsuario.objects.create(user=lector, tipo_usuario='bibliotecario')
+        self.client.force_authenticate(lector)
+
+        self.assertEqual(self.importar(self.CSV).status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(Libro.objects.exists())
+
+
+@pytest.mark.django_db
+class TestPrestamosVencidos(APITestCase):
+    """Pruebas del marcado de préstamos vencidos"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='lector', password='testpass123')
+        PerfilUsuario.objects.create(user=self.user, tipo_usuario='premium')
+        self.client.force_authenticate(self.user)
+
+        autor = Autor.objects.create(nombre='Adolfo', apellido='Bioy Casares')
+        fechas = [date(2024, 1, 1), date(2024, 2, 1), date(2024, 3, 1), date(2030, 1, 1)]
+        self.prestamos = [
+            Prestamo.objects.create(
+                libro=Libro.objects.create(titulo=f'Libro {i}', autor=autor, isbn=f'{i:013d}',
+                                           anio_publicacion=1940, estado='prestado'),
+                usuario=self.user, fecha_devolucion=fecha
+            )
+            for i, fecha in enumerate(fechas)
+        ]
+
+    def test_marcar_vencidos_por_bloques(self):
+        """Test: El comando marca los vencidos con un registro de auditoría por bloque"""
+        salida = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('marcar_prestamos_vencidos', '--fecha', '2025-01-01', '--chunk-size', '2', stdout=salida)
+
+        self.assertIn('3 préstamos marcados', salida.getvalue())
+        self.assertEqual(
+            list(Prestamo.objects.order_by('pk').values_list('estado', flat=True)),
+            ['vencido', 'vencido', 'vencido', 'activo']
+        )
+        self.assertEqual(PerfilUsuario.objects.get(user=self.user).prestamos_activos, 1)
+        logs = AuditLog.objects.filter(object_repr__endswith='préstamos vencidos').order_by('id')
+        self.assertEqual([len(log.changes['prestamos']) for log in logs], [2, 1])
+
+    def test_devolver_vencido(self):
+        """Test: Un préstamo vencido se puede devolver y libera el libro"""
+        call_command('marcar_prestamos_vencidos', '--fecha', '2025-01-01', stdout=StringIO())
+        prestamo = self.prestamos[0]
+
+        response = self.client.post(f'/api/libros/prestamos/{prestamo.id}/devolver/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        prestamo.refresh_from_db()
+        self.assertEqual(prestamo.estado, 'devuelto')
+        self.assertEqual(prestamo.libro.estado, 'disponible')
+        self.assertEqual(PerfilUsuario.objects.get(user=self.user).prestamos_activos, 1)
+
+    @skipUnless(connection.vendor == 'sqlite', 'Usa EXPLAIN QUERY PLAN de SQLite')
+    def test_barrido_usa_indice(self):
+        """Test: Cada bloque de vencidos usa el índice de estado y fecha de devolución sin ordenar"""
+        plan = (
+            Prestamo.objects.filter(estado='activo', fecha_devolucion__lt=date(2025, 1, 1))
+            .order_by().values_list('pk', 'usuario_id')[:100].explain()
+        )
+        self.assertRegex(plan, r'USING (COVERING )?INDEX prestamo_estado_devol_idx\b', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+
+@pytest.mark.django_db
+class TestMiniaturasPortada(APITestCase):
+    """Pruebas de las miniaturas de portada generadas bajo demanda"""
+
+    def setUp(self):
+        cache.clear()
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        ajustes = override_settings(MEDIA_ROOT=media, LIBROS_RENDITIONS_DIR=os.path.join(media, 'renditions'))
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        self.user = User.objects.create_user(username='lector', password='testpass123')
+        PerfilUsuario.objects.create(user=self.user)
+        self.client.force_authenticate(self.user)
+        autor = Autor.objects.create(nombre='Julio', apellido='Cortázar')
+        self.libro = Libro.objects.create(
+            titulo='Rayuela', autor=autor, isbn='9788437604572', anio_publicacion=1963,
+            portada=self.imagen('rayuela.png', (800, 1200), 'red')
+        )
+
+    def imagen(self, nombre, tamano, color):
+        contenido = io.BytesIO()
+        Image.new('RGB', tamano, color).save(contenido, 'PNG')
+        return SimpleUploadedFile(nombre, contenido.getvalue(), content_type='image/png')
+
+    def url_miniatura(self, size='small', formato='webp'):
+        response = self.client.get(f'/api/libros/libros/{self.libro.id}/')
+        return response.data['portadas'][size][formato]
+
+    def test_generar_una_vez_y_servir_del_disco(self):
+        """Test: La primera petición genera la miniatura y las siguientes no consultan la base de datos"""
+        url = self.url_miniatura()
+        self.assertIn(self.libro.portada_hash, url)
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertIn('immutable', response['Cache-Control'])
+        miniatura = Image.open(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(miniatura.size, (213, 320))
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            b''.join(response.streaming_content)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_rangos(self):
+        """Test: Se sirven rangos de bytes y se rechazan los no satisfacibles"""
+        url = self.url_miniatura('thumb', 'jpeg')
+        completo = b''.join(self.client.get(url).streaming_content)
+
+        response = self.client.get(url, HTTP_RANGE='bytes=0-9')
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(response.content, completo[:10])
+        self.assertEqual(response['Content-Range'], f'bytes 0-9/{len(completo)}')
+
+        response = self.client.get(url, HTTP_RANGE=f'bytes={len(completo)}-')
+        self.assertEqual(response.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+
+    def test_cambiar_portada_purga_miniaturas(self):
+        """Test: Al cambiar la portada se borran las miniaturas de la anterior"""
+        url = self.url_miniatura()
+        b''.join(self.client.get(url).streaming_content)
+        anterior = self.libro.portada_hash
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.libro.portada = self.imagen('rayuela-2.png', (600, 900), 'blue')
+            self.libro.save()
+
+        self.assertNotEqual(self.libro.portada_hash, anterior)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertNotIn(anterior, self.url_miniatura())
+
+    def test_portada_demasiado_grande(self):
+        """Test: Una portada que Pillow rechaza por tamaño devuelve 400, no 500"""
+        url = self.url_miniatura()
+        with mock.patch.object(Image, 'MAX_IMAGE_PIXELS', 1000):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('portada', response.data)
+
+    def test_libro_sin_portada(self):
+        """Test: Un libro sin portada no expone miniaturas"""
+        self.libro.portada = None
+        self.libro.save()
+
+        response = self.client.get(f'/api/libros/libros/{self.libro.id}/')
+        self.assertIsNone(response.data['portadas'])
+        self.assertEqual(self.libro.portada_hash, '')
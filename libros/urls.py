@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import AutorViewSet, GeneroViewSet, LibroViewSet, PrestamoViewSet
+from .views import AutorViewSet, GeneroViewSet, LibroViewSet, PortadaRenditionView, PrestamoViewSet
 
 router = DefaultRouter()
 router.register(r'autores', AutorViewSet)
@@ -10,4 +10,6 @@ router.register(r'prestamos', PrestamoViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
-]
\ No newline at end of file
+    path('portadas/<str:portada_hash>/<str:size>.<str:formato>', PortadaRenditionView.as_view(),
+         name='portada-rendition'),
+]
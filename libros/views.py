@@ -1,58 +1,151 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.authtoken.models import Token
+from django.conf import settings
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
+from django.db import transaction
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from auditoria.buffer import add_audit_log
+from auditoria.models import AuditLog
+from libreria_api.pagination import CursorOrPageNumberPagination
+from usuarios.models import PerfilUsuario
+from .bulk import bulk_devolver, bulk_prestar, max_items
+from .caching import CachedResponseMixin, bump_version
+from .conditional import ConditionalGetMixin
+from .filters import facet_counts, filter_libros
+from .importer import DEFAULT_IMPORT_MAX_UPLOAD_BYTES, detect_format, import_catalog
 from .models import Autor, Genero, Libro, Prestamo
+from .renditions import FORMATS, get_or_create_rendition, parse_range, rendition_path
+from .search import search_libros
 from .serializers import (
     AutorSerializer, GeneroSerializer, LibroSerializer, 
     PrestamoSerializer, PrestamoCreateSerializer
 )
 
-class AutorViewSet(viewsets.ModelViewSet):
+class AutorViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     queryset = Autor.objects.all()
     serializer_class = AutorSerializer
     permission_classes = [permissions.IsAuthenticated]
+    cache_dependencies = (Autor,)
 
-class GeneroViewSet(viewsets.ModelViewSet):
+class GeneroViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     queryset = Genero.objects.all()
     serializer_class = GeneroSerializer
     permission_classes = [permissions.IsAuthenticated]
+    cache_dependencies = (Genero,)
 
-class LibroViewSet(viewsets.ModelViewSet):
-    queryset = Libro.objects.all()
+class LibroViewSet(ConditionalGetMixin, CachedResponseMixin, viewsets.ModelViewSet):
+    queryset = Libro.objects.select_related('autor', 'genero')
     serializer_class = LibroSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = CursorOrPageNumberPagination
+    cursor_ordering = ['-fecha_creacion', '-id']
+    cache_dependencies = (Libro, Autor, Genero)
+    
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        return filter_libros(queryset, self.request.query_params)
+    
+    def get_paginated_response(self, data):
+        """Página del listado con el conteo de facetas del filtro"""
+        response = super().get_paginated_response(data)
+        response.data['facets'] = facet_counts(self.filter_queryset(self.get_queryset()))
+        return response
+    
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """Búsqueda de texto completo ordenada por relevancia (?q=&limit=)"""
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'El parámetro q es obligatorio'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), 100)
+        except ValueError:
+            return Response({'error': 'limit debe ser un número entero'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        libros = search_libros(self.filter_queryset(self.get_queryset()), query, limit)
+        return Response({
+            'query': query,
+            'results': self.get_serializer(libros, many=True).data
+        })
+    
+    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAdminUser],
+            parser_classes=[MultiPartParser])
+    def importar(self, request):
+        """Importar libros desde un fichero CSV o JSONL (campo archivo)"""
+        archivo = request.FILES.get('archivo')
+        if archivo is None:
+            return Response({'error': 'Falta el fichero (campo archivo)'}, status=status.HTTP_400_BAD_REQUEST)
+        # La importación corre dentro de la petición: los ficheros grandes, con el comando
+        max_bytes = getattr(settings, 'LIBROS_IMPORT_MAX_UPLOAD_BYTES', DEFAULT_IMPORT_MAX_UPLOAD_BYTES)
+        if archivo.size > max_bytes:
+            return Response(
+                {'error': f'El fichero supera {max_bytes} bytes: usa python manage.py importar_catalogo'},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
+        try:
+            fmt = request.data.get('formato') or detect_format(archivo.name)
+            stats = import_catalog(archivo, fmt, user=request.user)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(stats)
     
     @action(detail=True, methods=['post'])
     def prestar(self, request, pk=None):
+        """Prestar un libro: reserva condicional y límite en una transacción"""
         libro = self.get_object()
-        if libro.estado != 'disponible':
-            return Response({'error': 'El libro no está disponible'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        perfil = request.user.perfil
-        if not perfil.puede_prestar():
-            return Response({'error': 'Has alcanzado tu límite de préstamos'}, status=status.HTTP_400_BAD_REQUEST)
-        
         serializer = PrestamoCreateSerializer(data=request.data)
-        if serializer.is_valid():
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        with transaction.atomic():
+            # Bloquear solo el perfil del usuario: sus préstamos simultáneos no
+            # pueden superar el límite, los de otros usuarios no esperan
+            perfil = PerfilUsuario.objects.select_for_update().get(user=request.user)
+            if not perfil.puede_prestar():
+                return Response({'error': 'Has alcanzado tu límite de préstamos'}, status=status.HTTP_400_BAD_REQUEST)
+            
+            # UPDATE ... WHERE estado = 'disponible': solo una petición lo consigue
+            reservado = Libro.objects.filter(pk=libro.pk, estado='disponible').update(
+                estado='prestado', fecha_actualizacion=timezone.now()
+            )
+            if not reservado:
+                return Response({'error': 'El libro no está disponible'}, status=status.HTTP_409_CONFLICT)
+            
             prestamo = serializer.save(libro=libro, usuario=request.user)
-            libro.estado = 'prestado'
-            libro.save()
-            return Response(PrestamoSerializer(prestamo).data, status=status.HTTP_201_CREATED)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            add_audit_log(AuditLog(
+                user=request.user,
+                action='PRESTAMO',
+                object_type='Libro',
+                object_id=libro.pk,
+                object_repr=str(libro)[:200],
+                changes={'estado': {'old': 'disponible', 'new': 'prestado'}, 'prestamo': prestamo.pk}
+            ))
+            # update() no envía post_save: invalidar a mano la caché del catálogo
+            transaction.on_commit(lambda: bump_version(Libro))
+        
+        return Response(PrestamoSerializer(prestamo).data, status=status.HTTP_201_CREATED)
 
-class PrestamoViewSet(viewsets.ModelViewSet):
-    queryset = Prestamo.objects.all()
+class PrestamoViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
+    queryset = Prestamo.objects.select_related('libro', 'usuario')
     serializer_class = PrestamoSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = CursorOrPageNumberPagination
+    cursor_ordering = ['-fecha_prestamo', '-id']
+    cache_dependencies = (Libro,)
     
     def get_queryset(self):
         user = self.request.user
+        queryset = super().get_queryset()
         if user.perfil.tipo_usuario in ['bibliotecario', 'dba']:
-            return Prestamo.objects.all()
-        return Prestamo.objects.filter(usuario=user)
+            return queryset
+        return queryset.filter(usuario=user)
     
     @action(detail=True, methods=['post'])
     def devolver(self, request, pk=None):
@@ -60,9 +153,99 @@ class PrestamoViewSet(viewsets.ModelViewSet):
         if prestamo.usuario != request.user and request.user.perfil.tipo_usuario not in ['bibliotecario', 'dba']:
             return Response({'error': 'No tienes permisos'}, status=status.HTTP_403_FORBIDDEN)
         
-        if prestamo.estado != 'activo':
+        if prestamo.estado not in ['activo', 'vencido']:
             return Response({'error': 'El préstamo no está activo'}, status=status.HTTP_400_BAD_REQUEST)
         
         prestamo.estado = 'devuelto'
         prestamo.save()
         return Response({'message': 'Libro devuelto correctamente'})
+    
+    def _lote(self, request, campo):
+        """Lista del lote o una respuesta de error (solo bibliotecarios, hasta el máximo)"""
+        if request.user.perfil.tipo_usuario not in ['bibliotecario', 'dba']:
+            return None, Response({'error': 'No tienes permisos'}, status=status.HTTP_403_FORBIDDEN)
+        
+        items = request.data.get(campo)
+        if not isinstance(items, list) or not items:
+            return None, Response({'error': f'{campo} debe ser una lista no vacía'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > max_items():
+            return None, Response(
+                {'error': f'Como máximo {max_items()} elementos por petición'}, status=status.HTTP_400_BAD_REQUEST
+            )
+        return items, None
+    
+    def _respuesta_lote(self, resultados):
+        return Response({
+            'procesados': sum(1 for resultado in resultados if resultado['ok']),
+            'resultados': resultados
+        })
+    
+    @action(detail=False, methods=['post'])
+    def bulk_prestar(self, request):
+        """Prestar varios libros en una petición: {"prestamos": [{libro, usuario, fecha_devolucion}]}"""
+        items, error = self._lote(request, 'prestamos')
+        if error:
+            return error
+        return self._respuesta_lote(bulk_prestar(items, request.user))
+    
+    @action(detail=False, methods=['post'])
+    def bulk_devolver(self, request):
+        """Devolver varios préstamos en una petición: {"prestamos": [id, ...]}"""
+        ids, error = self._lote(request, 'prestamos')
+        if error:
+            return error
+        if not all(isinstance(prestamo_id, int) and not isinstance(prestamo_id, bool) for prestamo_id in ids):
+            return Response({'error': 'prestamos debe contener ids numéricos'}, status=status.HTTP_400_BAD_REQUEST)
+        return self._respuesta_lote(bulk_devolver(ids, request.user))
+
+
+class PortadaRenditionView(APIView):
+    """Miniatura de una portada; se genera en la primera petición y luego se lee del disco"""
+    permission_classes = [permissions.IsAuthenticated]
+    # La URL lleva el hash del contenido: la respuesta no cambia nunca
+    cache_control = 'private, max-age=31536000, immutable'
+    
+    def get(self, request, portada_hash, size, formato):
+        try:
+            rendition_path(portada_hash, size, formato)
+        except ValueError:
+            raise Http404
+        etag = f'"{portada_hash}-{size}-{formato}"'
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return self._cabeceras(not_modified, etag)
+        
+        path = get_or_create_rendition(portada_hash, size, formato, lambda: self._abrir_portada(portada_hash))
+        if path is None:
+            raise Http404
+        
+        length = path.stat().st_size
+        try:
+            rango = parse_range(request.headers.get('Range'), length)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{length}'
+            return self._cabeceras(response, etag)
+        if rango and request.headers.get('If-Range', etag) != etag:
+            rango = None
+        
+        content_type = FORMATS[formato][1]
+        if rango is None:
+            response = FileResponse(open(path, 'rb'), content_type=content_type)
+        else:
+            start, end = rango
+            with open(path, 'rb') as f:
+                f.seek(start)
+                response = HttpResponse(f.read(end - start + 1), status=206, content_type=content_type)
+            response['Content-Range'] = f'bytes {start}-{end}/{length}'
+        return self._cabeceras(response, etag)
+    
+    def _abrir_portada(self, portada_hash):
+        libro = Libro.objects.filter(portada_hash=portada_hash).only('pk', 'portada').first()
+        return libro.portada.open('rb') if libro else None
+    
+    def _cabeceras(self, response, etag):
+        response['ETag'] = etag
+        response['Cache-Control'] = self.cache_control
+        response['Accept-Ranges'] = 'bytes'
+        return response
@@ -0,0 +1,47 @@
+import pytest
+from io import StringIO
+from django.core.cache import cache
+from rest_framework.test import APITestCase
+from auditoria.models import AuditLog
+from benchmarks.run import SCENARIOS, percentile, run_benchmarks
+from benchmarks.seed import seed
+from libros.models import Libro, Prestamo
+from usuarios.models import PerfilUsuario
+
+CONTEOS = {'autores': 5, 'usuarios': 6, 'libros': 40, 'prestamos': 60, 'audit_logs': 80}
+
+@pytest.mark.django_db
+class TestBenchmarks(APITestCase):
+    """Pruebas de humo de la siembra y del ejecutor de benchmarks"""
+
+    def setUp(self):
+        cache.clear()
+        seed(CONTEOS, chunk_size=25, stdout=StringIO())
+
+    def test_siembra_coherente(self):
+        """Test: Se siembran los volúmenes pedidos con préstamos abiertos coherentes"""
+        self.assertEqual(Libro.objects.count(), 40)
+        self.assertEqual(Prestamo.objects.count(), 60)
+        self.assertEqual(AuditLog.objects.count(), 80)
+        abiertos = Prestamo.objects.filter(estado__in=['activo', 'vencido'])
+        self.assertEqual(abiertos.count(), 2)
+        self.assertEqual(Libro.objects.filter(estado='prestado').count(), 2)
+        # Los contadores ya están reconciliados
+        self.assertEqual(PerfilUsuario.reconciliar_prestamos_activos(), 0)
+
+    def test_informe_de_escenarios(self):
+        """Test: Cada escenario informa de percentiles, throughput y consultas sin errores"""
+        informe = run_benchmarks(iterations=3, concurrency=1)
+
+        self.assertEqual(set(informe['escenarios']) - {'devolver'}, set(SCENARIOS))
+        for nombre, resultado in informe['escenarios'].items():
+            self.assertEqual(resultado['errores'], 0, nombre)
+            self.assertIsNotNone(resultado['latencia_ms']['p99'])
+            self.assertGreater(resultado['consultas']['max'], 0, nombre)
+
+    def test_percentiles(self):
+        """Test: Percentil por rango más cercano"""
+        valores = list(range(1, 101))
+        self.assertEqual(percentile(valores, 50), 50)
+        self.assertEqual(percentile(valores, 99), 99)
+        self.assertIsNone(percentile([], 95))
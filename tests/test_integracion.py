@@ -55,7 +55,9 @@ class TestAuditoriaIntegracion(APITestCase):
         from auditoria.models import AuditLog
         initial_logs = AuditLog.objects.count()
         
-        response = self.client.post('/api/libros/libros/', self.libro_data)
+        # Los logs se escriben al confirmar la transacción
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/libros/libros/', self.libro_data)
         
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         final_logs = AuditLog.objects.count()
@@ -77,7 +79,8 @@ class TestAuditoriaIntegracion(APITestCase):
         
         # Actualizar libro
         update_data = {'titulo': 'Cien años de soledad (Edición Especial)'}
-        response = self.client.patch(f'/api/libros/libros/{libro.id}/', update_data)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(f'/api/libros/libros/{libro.id}/', update_data)
         
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         
@@ -96,7 +99,8 @@ class TestAuditoriaIntegracion(APITestCase):
         initial_logs = AuditLog.objects.count()
         
         # Eliminar libro
-        response = self.client.delete(f'/api/libros/libros/{libro.id}/')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(f'/api/libros/libros/{libro.id}/')
         
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         
@@ -118,7 +122,8 @@ class TestAuditoriaIntegracion(APITestCase):
             'libro': libro.id,
             'fecha_devolucion': '2024-12-31'
         }
-        response = self.client.post(f'/api/libros/libros/{libro.id}/prestar/', prestamo_data)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/api/libros/libros/{libro.id}/prestar/', prestamo_data)
         
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         
@@ -0,0 +1,70 @@
+import json
+import logging
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from libreria_api.log_handlers import JsonAuditFormatter, QueueRotatingFileHandler
+
+
+class TestLoggingEnCola(TestCase):
+    """Pruebas de los handlers de logging en cola y del formato JSON de auditoría"""
+
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directorio, ignore_errors=True)
+        self.fichero = os.path.join(self.directorio, 'logs', 'audit.log')
+
+    def registro(self, mensaje, **extra):
+        record = logging.LogRecord('audit', logging.INFO, __file__, 1, mensaje, None, None)
+        record.__dict__.update(extra)
+        return record
+
+    def test_formato_tolera_campos_ausentes(self):
+        """Test: Los campos de auditoría que faltan se escriben como null"""
+        formatter = JsonAuditFormatter()
+
+        sin_campos = json.loads(formatter.format(self.registro('Error creating audit log')))
+        completo = json.loads(formatter.format(self.registro(
+            'export_csv', user='admin', action='EXPORT', object_type='AuditLog', changes={'from': '2026-01-01'}
+        )))
+
+        self.assertEqual(sin_campos['message'], 'Error creating audit log')
+        self.assertIsNone(sin_campos['user'])
+        self.assertIsNone(sin_campos['object_id'])
+        self.assertEqual(completo['action'], 'EXPORT')
+        self.assertEqual(completo['changes'], {'from': '2026-01-01'})
+
+    def test_escribe_desde_el_listener(self):
+        """Test: El handler crea el directorio y el listener escribe al cerrar la cola"""
+        handler = QueueRotatingFileHandler(self.fichero, maxBytes=1024 * 1024, backupCount=1)
+        handler.setFormatter(JsonAuditFormatter())
+        logger = logging.getLogger('tests.logging_en_cola')
+        logger.propagate = False
+        logger.addHandler(handler)
+        self.addCleanup(logger.removeHandler, handler)
+
+        try:
+            raise ValueError('fallo')
+        except ValueError:
+            logger.exception('Error en %s', 'exportación', extra={'action': 'EXPORT'})
+        handler.close()
+
+        with open(self.fichero, encoding='utf-8') as f:
+            linea = json.loads(f.readline())
+        self.assertEqual(linea['message'], 'Error en exportación')
+        self.assertEqual(linea['action'], 'EXPORT')
+        self.assertIn('ValueError: fallo', linea['exception'])
+
+    def test_cola_llena_descarta_sin_esperar(self):
+        """Test: Con la cola llena los registros se descartan en lugar de bloquear"""
+        handler = QueueRotatingFileHandler(self.fichero, queue_size=1)
+        # Sin listener nadie vacía la cola
+        handler.listener.stop()
+        handler.listener = None
+
+        for i in range(3):
+            handler.handle(self.registro(f'mensaje {i}'))
+
+        self.assertEqual(handler.dropped, 2)
+        handler.close()
@@ -0,0 +1,107 @@
+import json
+import os
+import shutil
+import tempfile
+import pytest
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+from auditoria.models import AuditLog
+from libreria_api.metrics import QueryCounter, registry
+from libros.models import Autor, Libro
+from usuarios.models import PerfilUsuario
+
+@pytest.mark.django_db
+class TestMetricas(APITestCase):
+    """Pruebas de las métricas por endpoint en formato Prometheus"""
+
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+        self.admin = User.objects.create_user(username='admin', password='testpass123', is_staff=True)
+        PerfilUsuario.objects.create(user=self.admin, tipo_usuario='dba')
+        self.client.force_authenticate(self.admin)
+        autor = Autor.objects.create(nombre='Gabriela', apellido='Mistral')
+        Libro.objects.create(titulo='Desolación', autor=autor, isbn='9789561120725', anio_publicacion=1922)
+
+    def metricas(self):
+        response = self.client.get('/api/metrics')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        return response.content.decode()
+
+    def test_metricas_por_ruta(self):
+        """Test: Se registran latencia, consultas, tamaño y estado por ruta y método"""
+        self.client.get('/api/libros/libros/')
+        self.client.get('/api/libros/libros/')
+        self.client.get('/api/libros/libros/999999/')
+
+        texto = self.metricas()
+
+        etiquetas = 'route="libro-list",method="GET"'
+        self.assertIn(f'libreria_http_request_duration_seconds_count{{{etiquetas}}} 2', texto)
+        self.assertIn(f'libreria_http_db_queries_bucket{{{etiquetas},le="+Inf"}} 2', texto)
+        self.assertIn(f'libreria_http_response_size_bytes_count{{{etiquetas}}} 2', texto)
+        self.assertIn(f'libreria_http_responses_total{{{etiquetas},status="200"}} 2', texto)
+        self.assertIn('libreria_http_responses_total{route="libro-detail",method="GET",status="404"} 1', texto)
+        consultas = next(
+            linea for linea in texto.splitlines()
+            if linea.startswith(f'libreria_http_db_queries_sum{{{etiquetas}}}')
+        )
+        self.assertGreater(float(consultas.split()[-1]), 0)
+
+    def test_exportacion_en_streaming(self):
+        """Test: En las exportaciones en streaming se miden las consultas y el tamaño del cuerpo"""
+        AuditLog.objects.bulk_create([
+            AuditLog(user=self.admin, action='CREATE', object_type='Libro', object_id=i) for i in range(5)
+        ])
+
+        # CaptureQueriesContext no sirve aquí: request_started vacía connection.queries
+        ejecutadas = QueryCounter()
+        with connection.execute_wrapper(ejecutadas):
+            response = self.client.get('/api/auditoria/logs/export_excel/')
+            cuerpo = b''.join(response.streaming_content)
+        texto = self.metricas()
+
+        etiquetas = 'route="auditlog-export-excel",method="GET"'
+        self.assertIn(f'libreria_http_request_duration_seconds_count{{{etiquetas}}} 1', texto)
+        self.assertIn(f'libreria_http_response_size_bytes_sum{{{etiquetas}}} {len(cuerpo)}', texto)
+        consultas = next(
+            linea for linea in texto.splitlines()
+            if linea.startswith(f'libreria_http_db_queries_sum{{{etiquetas}}}')
+        )
+        # Incluye las consultas del generador, que corren después de la vista
+        self.assertEqual(float(consultas.split()[-1]), ejecutadas.count)
+
+    def test_solo_administradores(self):
+        """Test: Solo los administradores pueden leer las métricas"""
+        lector = User.objects.create_user(username='lector', password='testpass123')
+        PerfilUsuario.objects.create(user=lector)
+        self.client.force_authenticate(lector)
+
+        self.assertEqual(self.client.get('/api/metrics').status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_agregacion_multiproceso(self):
+        """Test: En modo multiproceso se suman los volcados de todos los workers"""
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio, ignore_errors=True)
+        otro_worker = [{
+            'route': 'libro-list', 'method': 'GET',
+            'latency': {'counts': [3] + [0] * 11, 'sum': 0.003},
+            'queries': {'counts': [0, 0, 0, 3] + [0] * 6, 'sum': 9},
+            'size': {'counts': [0, 3] + [0] * 7, 'sum': 1500},
+            'query_seconds': 0.002,
+            'status': {'200': 3},
+        }]
+        with open(os.path.join(directorio, 'metrics-1.json'), 'w') as f:
+            json.dump(otro_worker, f)
+
+        with override_settings(METRICS_MULTIPROC_DIR=directorio):
+            self.client.get('/api/libros/libros/')
+            texto = self.metricas()
+
+        self.assertIn('libreria_http_responses_total{route="libro-list",method="GET",status="200"} 4', texto)
+        self.assertTrue(os.path.exists(os.path.join(directorio, f'metrics-{os.getpid()}.json')))
@@ -0,0 +1,105 @@
+import pytest
+from datetime import date
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from auditoria.models import AuditLog
+from libros.caching import bump_version
+from libros.models import Autor, Genero, Libro, Prestamo
+from usuarios.models import PerfilUsuario
+
+@pytest.mark.django_db
+class TestPresupuestoConsultas(APITestCase):
+    """Presupuesto de consultas fijo para cada listado y detalle de la API.
+
+    Cada endpoint se mide con pocos y con muchos registros: el número de
+    consultas no debe depender del tamaño de la página (sin N+1).
+    """
+
+    # Consultas por listado con la autenticación ya en caché: COUNT (paginación
+    # por número) + página con sus relaciones + facetas del catálogo + agregado
+    # de fecha_actualizacion para la ETag (libros y préstamos)
+    PRESUPUESTO = {
+        '/api/libros/autores/': 2,
+        '/api/libros/generos/': 2,
+        '/api/libros/libros/': 3,
+        '/api/libros/prestamos/': 2,
+        '/api/usuarios/users/': 2,
+        '/api/usuarios/perfiles/': 2,
+        '/api/auditoria/logs/': 1,
+    }
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='bibliotecario', password='testpass123')
+        PerfilUsuario.objects.create(user=self.user, tipo_usuario='bibliotecario')
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        # La primera petición deja token, usuario y perfil en la caché de autenticación
+        self.client.get('/api/libros/autores/')
+        self.sembrados = 0
+
+    def sembrar(self, cantidad):
+        """Crear ``cantidad`` registros relacionados de cada modelo"""
+        inicio = self.sembrados
+        self.sembrados += cantidad
+        rango = range(inicio, self.sembrados)
+
+        autores = Autor.objects.bulk_create([
+            Autor(nombre=f'Autor {i}', apellido='Apellido') for i in rango
+        ])
+        generos = Genero.objects.bulk_create([Genero(nombre=f'Género {i}') for i in rango])
+        libros = Libro.objects.bulk_create([
+            Libro(titulo=f'Libro {i}', autor=autor, genero=genero, isbn=f'{i:013d}', anio_publicacion=2000)
+            for i, autor, genero in zip(rango, autores, generos)
+        ])
+        usuarios = User.objects.bulk_create([User(username=f'usuario{i}') for i in rango])
+        PerfilUsuario.objects.bulk_create([PerfilUsuario(user=usuario) for usuario in usuarios])
+        Prestamo.objects.bulk_create([
+            Prestamo(libro=libro, usuario=usuario, fecha_devolucion=date(2030, 1, 1))
+            for libro, usuario in zip(libros, usuarios)
+        ])
+        bump_version(Autor, Genero, Libro)
+        AuditLog.objects.bulk_create([
+            AuditLog(user=usuario, action='CREATE', object_type='Libro', object_id=libro.id)
+            for libro, usuario in zip(libros, usuarios)
+        ])
+
+    maxDiff = None
+
+    def consultas(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, url)
+        return response, len(queries)
+
+    def test_listados_con_presupuesto_fijo(self):
+        """Test: Los listados hacen un número fijo de consultas"""
+        self.sembrar(3)
+        pocos = {url: self.consultas(url)[1] for url in self.PRESUPUESTO}
+        self.sembrar(15)
+        muchos = {url: self.consultas(url)[1] for url in self.PRESUPUESTO}
+
+        self.assertEqual(pocos, muchos)
+        self.assertEqual(muchos, self.PRESUPUESTO)
+
+    def test_detalles_con_presupuesto_fijo(self):
+        """Test: Los detalles hacen un número fijo de consultas"""
+        self.sembrar(3)
+        # Validadores de la ETag (libros y préstamos) + objeto con sus relaciones
+        detalles = {
+            f'/api/libros/autores/{Autor.objects.first().pk}/': 1,
+            f'/api/libros/generos/{Genero.objects.first().pk}/': 1,
+            f'/api/libros/libros/{Libro.objects.first().pk}/': 2,
+            f'/api/libros/prestamos/{Prestamo.objects.first().pk}/': 2,
+            f'/api/usuarios/users/{self.user.pk}/': 1,
+            f'/api/usuarios/perfiles/{PerfilUsuario.objects.first().pk}/': 1,
+            f'/api/auditoria/logs/{AuditLog.objects.first().pk}/': 1,
+        }
+        medidos = {url: self.consultas(url)[1] for url in detalles}
+
+        self.assertEqual(medidos, detalles)
@@ -0,0 +1,89 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connections
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APIClient
+from libreria_api.routers import STICKY_COOKIE
+from libros.models import Autor, Libro
+from usuarios.models import PerfilUsuario
+
+
+class TestRouterReplica(TransactionTestCase):
+    """Pruebas del reparto de lecturas entre primaria y réplica.
+
+    Sin DB_REPLICA_* configurada se registra un alias ``replica`` espejo de la
+    base de pruebas (como ``TEST['MIRROR']``): misma base, conexión distinta.
+    """
+
+    databases = {'default', 'replica'}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.replica_temporal = 'replica' not in connections.settings
+        if cls.replica_temporal:
+            default = connections['default'].settings_dict
+            connections.settings['replica'] = {**default, 'TEST': {**default['TEST'], 'MIRROR': 'default'}}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        if cls.replica_temporal:
+            connections['replica'].close()
+            del connections['replica']
+            del connections.settings['replica']
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='bibliotecario', password='testpass123')
+        PerfilUsuario.objects.create(user=self.user, tipo_usuario='bibliotecario')
+        autor = Autor.objects.create(nombre='Isabel', apellido='Allende')
+        Libro.objects.create(titulo='La casa de los espíritus', autor=autor, isbn='9788401242281',
+                             anio_publicacion=1982)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def tearDown(self):
+        # Borrar con el ORM para que las señales limpien el índice de búsqueda
+        Libro.objects.all().delete()
+
+    def get(self, url):
+        with CaptureQueriesContext(connections['default']) as primaria, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return primaria, replica
+
+    def test_lecturas_a_la_replica(self):
+        """Test: Los GET de la API leen de la réplica"""
+        primaria, replica = self.get('/api/libros/libros/')
+
+        self.assertTrue(any('libros_libro' in query['sql'] for query in replica.captured_queries))
+        self.assertEqual(len(primaria), 0)
+
+    def test_lectura_tras_escritura_en_la_primaria(self):
+        """Test: Tras escribir, el cliente lee de la primaria mientras dure la cookie"""
+        response = self.client.post('/api/libros/autores/', {'nombre': 'Laura', 'apellido': 'Esquivel'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIn(STICKY_COOKIE, response.cookies)
+
+        primaria, replica = self.get('/api/libros/libros/')
+        self.assertEqual(len(replica), 0)
+        self.assertGreater(len(primaria), 0)
+
+    def test_busqueda_en_la_replica(self):
+        """Test: La búsqueda consulta el índice y los libros en la misma base, la réplica"""
+        with CaptureQueriesContext(connections['default']) as primaria, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            response = self.client.get('/api/libros/libros/search/', {'q': 'espiritus', 'anio_desde': 1900})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([libro['titulo'] for libro in response.data['results']], ['La casa de los espíritus'])
+        self.assertTrue(any('libros_libro_fts' in query['sql'] for query in replica.captured_queries))
+        self.assertEqual(len(primaria), 0)
+
+    def test_fuera_de_peticiones_usa_la_primaria(self):
+        """Test: Comandos y código fuera de una petición usan siempre la primaria"""
+        self.assertEqual(Libro.objects.all().db, 'default')
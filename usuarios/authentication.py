@@ -0,0 +1,63 @@
+"""Autenticación por token con caché local del usuario y su perfil.
+
+La primera petición con un token resuelve token, usuario y ``PerfilUsuario``
+en una sola consulta; las siguientes, hasta ``AUTH_TOKEN_CACHE_TIMEOUT``
+segundos, no consultan la base de datos. Las entradas se borran al cerrar
+sesión (borrado del token) y al guardar o borrar el usuario o su perfil.
+
+El borrado solo alcanza a los procesos que comparten la caché ``auth``. Con
+la caché en memoria por defecto, un token borrado o rotado sigue aceptándose
+en los demás workers hasta ``AUTH_TOKEN_CACHE_TIMEOUT`` segundos.
+
+El perfil cacheado sirve para comprobar el tipo de usuario; los contadores
+que cambian con ``F()`` (``prestamos_activos``) se leen siempre de la tabla.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+DEFAULT_TIMEOUT = 60
+
+
+def get_auth_cache():
+    return caches[getattr(settings, 'AUTH_TOKEN_CACHE_ALIAS', 'auth')]
+
+
+def _cache_key(key):
+    return 'auth:token:' + hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def evict_token(key):
+    get_auth_cache().delete(_cache_key(key))
+
+
+def evict_user(user_id):
+    """Borrar de la caché los tokens del usuario"""
+    for key in Token.objects.filter(user_id=user_id).values_list('key', flat=True):
+        evict_token(key)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """``TokenAuthentication`` con usuario y perfil cacheados en memoria"""
+
+    def authenticate_credentials(self, key):
+        cache = get_auth_cache()
+        cache_key = _cache_key(key)
+        cached = cache.get(cache_key)
+        if cached is None:
+            try:
+                token = Token.objects.select_related('user__perfil').get(key=key)
+            except Token.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            cached = (token.user, token)
+            cache.set(cache_key, cached, getattr(settings, 'AUTH_TOKEN_CACHE_TIMEOUT', DEFAULT_TIMEOUT))
+
+        user, token = cached
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        return user, token
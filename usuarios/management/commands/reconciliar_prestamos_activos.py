@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from usuarios.models import PerfilUsuario
+
+
+class Command(BaseCommand):
+    help = 'Recalcular el contador de préstamos activos de los perfiles desfasados'
+
+    def handle(self, *args, **options):
+        corregidos = PerfilUsuario.reconciliar_prestamos_activos()
+        if corregidos:
+            self.stdout.write(self.style.SUCCESS(f'Contadores corregidos: {corregidos} perfil(es)'))
+        else:
+            self.stdout.write('Todos los contadores coinciden')
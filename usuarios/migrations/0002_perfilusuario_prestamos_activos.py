@@ -0,0 +1,31 @@
+# Generated by Django 5.2.11 on 2026-10-17 15:28
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def contar_prestamos_activos(apps, schema_editor):
+    PerfilUsuario = apps.get_model('usuarios', 'PerfilUsuario')
+    Prestamo = apps.get_model('libros', 'Prestamo')
+    PerfilUsuario.objects.update(prestamos_activos=Coalesce(Subquery(
+        Prestamo.objects.filter(usuario=OuterRef('user'), estado='activo')
+        .order_by().values('usuario').annotate(total=Count('id')).values('total')
+    ), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0001_initial'),
+        ('libros', '0004_prestamo_fecha_actualizacion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='perfilusuario',
+            name='prestamos_activos',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(contar_prestamos_activos, migrations.RunPython.noop),
+    ]
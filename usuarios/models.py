@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import Case, Count, F, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 
 class PerfilUsuario(models.Model):
@@ -17,6 +19,9 @@ class PerfilUsuario(models.Model):
     fecha_registro = models.DateTimeField(auto_now_add=True)
     limite_prestamos = models.IntegerField(default=3)
     activo = models.BooleanField(default=True)
+    # Préstamos en estado 'activo'; lo mantiene Prestamo con F() y lo repara
+    # el comando reconciliar_prestamos_activos
+    prestamos_activos = models.PositiveIntegerField(default=0, editable=False)
     
     class Meta:
         verbose_name = "Perfil de Usuario"
@@ -29,13 +34,55 @@ class PerfilUsuario(models.Model):
         if self.tipo_usuario == 'premium':
             self.limite_prestamos = 10
         elif self.tipo_usuario == 'bibliotecario':
-            self.limite_prestimos = 50
+            self.limite_prestamos = 50
         elif self.tipo_usuario == 'dba':
-            self.limite_prestimos = 100
+            self.limite_prestamos = 100
         else:
-            self.limite_prestimos = 3
+            self.limite_prestamos = 3
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            # Un guardado completo no debe pisar el contador con un valor leído antes
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'prestamos_activos'
+            ]
         super().save(*args, **kwargs)
     
     def puede_prestar(self):
-        prestamos_activos = self.user.prestamos.filter(estado='activo').count()
-        return prestamos_activos < self.limite_prestimos
+        return self.prestamos_activos < self.limite_prestamos
+    
+    @classmethod
+    def ajustar_prestamos_activos(cls, user_id, delta):
+        """Sumar ``delta`` al contador con un UPDATE atómico"""
+        if delta:
+            cls.objects.filter(user_id=user_id).update(
+                prestamos_activos=F('prestamos_activos') + delta
+            )
+    
+    @classmethod
+    def ajustar_prestamos_activos_en_bloque(cls, deltas):
+        """Aplicar ``{user_id: delta}`` a varios perfiles en un solo UPDATE"""
+        deltas = {user_id: delta for user_id, delta in deltas.items() if delta}
+        if deltas:
+            cls.objects.filter(user_id__in=deltas).update(prestamos_activos=F('prestamos_activos') + Case(
+                *[When(user_id=user_id, then=Value(delta)) for user_id, delta in deltas.items()],
+                output_field=models.IntegerField()
+            ))
+    
+    @classmethod
+    def reconciliar_prestamos_activos(cls):
+        """Recalcular los contadores desfasados; devuelve cuántos se corrigieron"""
+        from libros.models import Prestamo
+        
+        reales = Coalesce(Subquery(
+            Prestamo.objects.filter(usuario=OuterRef('user'), estado='activo')
+            .order_by().values('usuario').annotate(total=Count('id')).values('total')
+        ), 0)
+        desfasados = list(
+            cls.objects.annotate(reales=reales)
+            .exclude(prestamos_activos=F('reales'))
+            .values_list('pk', flat=True)
+        )
+        # El recuento se repite en el UPDATE para no perder préstamos hechos entre medias
+        if desfasados:
+            cls.objects.filter(pk__in=desfasados).update(prestamos_activos=reales)
+        return len(desfasados)
@@ -0,0 +1,22 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from .authentication import evict_token, evict_user
+from .models import PerfilUsuario
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidar_token_usuario(sender, instance, **kwargs):
+    """El usuario cacheado por la autenticación deja de ser válido"""
+    evict_user(instance.pk)
+
+@receiver(post_save, sender=PerfilUsuario)
+@receiver(post_delete, sender=PerfilUsuario)
+def invalidar_token_perfil(sender, instance, **kwargs):
+    evict_user(instance.user_id)
+
+@receiver(post_delete, sender=Token)
+def invalidar_token_borrado(sender, instance, **kwargs):
+    """Cerrar sesión borra el token: también su entrada en caché"""
+    evict_token(instance.key)
@@ -1,3 +1,129 @@
-from django.test import TestCase
+import pytest
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from libros.models import Autor, Libro, Prestamo
+from .authentication import get_auth_cache
+from .models import PerfilUsuario
 
-# Create your tests here.
+@pytest.mark.django_db
+class TestContadorPrestamosActivos(APITestCase):
+    """Pruebas del contador de préstamos activos del perfil"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='lector', password='testpass123')
+        self.perfil = PerfilUsuario.objects.create(user=self.user, tipo_usuario='gratuito')
+        self.client.force_authenticate(self.user)
+
+        autor = Autor.objects.create(nombre='Mario', apellido='Benedetti')
+        self.libros = [
+            Libro.objects.create(titulo=f'Poema {i}', autor=autor, isbn=f'{i:013d}', anio_publicacion=1956)
+            for i in range(4)
+        ]
+
+    def prestar(self, libro):
+        return self.client.post(
+            f'/api/libros/libros/{libro.id}/prestar/',
+            {'libro': libro.id, 'fecha_devolucion': '2030-01-01'}
+        )
+
+    def contador(self):
+        self.perfil.refresh_from_db()
+        return self.perfil.prestamos_activos
+
+    def test_prestar_y_devolver(self):
+        """Test: Prestar suma al contador, devolver resta y el límite se lee de él"""
+        for libro in self.libros[:3]:
+            self.assertEqual(self.prestar(libro).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.contador(), 3)
+
+        response = self.prestar(self.libros[3])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        prestamo = Prestamo.objects.filter(usuario=self.user).first()
+        response = self.client.post(f'/api/libros/prestamos/{prestamo.id}/devolver/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.contador(), 2)
+        self.assertEqual(self.prestar(self.libros[3]).status_code, status.HTTP_201_CREATED)
+
+    def test_vencido_y_borrado(self):
+        """Test: Marcar vencido o borrar un préstamo activo resta del contador"""
+        for libro in self.libros[:2]:
+            self.prestar(libro)
+        vencido, borrado = Prestamo.objects.filter(usuario=self.user)
+
+        vencido.estado = 'vencido'
+        vencido.save()
+        self.assertEqual(self.contador(), 1)
+        vencido.delete()
+        self.assertEqual(self.contador(), 1)
+        borrado.delete()
+        self.assertEqual(self.contador(), 0)
+
+    def test_guardado_completo_no_pisa_el_contador(self):
+        """Test: Guardar un perfil leído antes de un préstamo conserva el contador"""
+        perfil = PerfilUsuario.objects.get(pk=self.perfil.pk)
+        self.prestar(self.libros[0])
+
+        perfil.telefono = '600000000'
+        perfil.save()
+        self.assertEqual(self.contador(), 1)
+
+    def test_reconciliar_contadores(self):
+        """Test: El comando corrige los contadores desfasados"""
+        self.prestar(self.libros[0])
+        PerfilUsuario.objects.filter(pk=self.perfil.pk).update(prestamos_activos=7)
+
+        salida = StringIO()
+        call_command('reconciliar_prestamos_activos', stdout=salida)
+
+        self.assertIn('1 perfil', salida.getvalue())
+        self.assertEqual(self.contador(), 1)
+
+
+@pytest.mark.django_db
+class TestAutenticacionCacheada(APITestCase):
+    """Pruebas de la autenticación por token con caché"""
+
+    def setUp(self):
+        get_auth_cache().clear()
+        self.user = User.objects.create_user(username='lector', password='testpass123')
+        self.perfil = PerfilUsuario.objects.create(user=self.user, tipo_usuario='gratuito')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.url = f'/api/usuarios/perfiles/{self.perfil.pk}/'
+
+    def test_una_consulta_y_luego_ninguna(self):
+        """Test: Token, usuario y perfil salen de una consulta y después de la caché"""
+        # Token con usuario y perfil + detalle del perfil
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+
+    def test_logout_invalida_la_cache(self):
+        """Test: Tras cerrar sesión el token cacheado deja de valer"""
+        self.client.get(self.url)
+
+        response = self.client.post('/api/usuarios/users/logout/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_guardar_perfil_o_usuario_invalida_la_cache(self):
+        """Test: Los cambios de perfil o usuario se ven en la siguiente petición"""
+        self.client.get(self.url)
+
+        self.perfil.tipo_usuario = 'bibliotecario'
+        self.perfil.save()
+        otro = User.objects.create_user(username='otro', password='testpass123')
+        PerfilUsuario.objects.create(user=otro)
+        response = self.client.get('/api/usuarios/perfiles/')
+        self.assertEqual(response.data['count'], 2)
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
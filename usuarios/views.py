@@ -49,12 +49,13 @@ class UserViewSet(viewsets.ModelViewSet):
             return Response({'error': 'No se pudo cerrar sesión'}, status=status.HTTP_400_BAD_REQUEST)
 
 class PerfilUsuarioViewSet(viewsets.ModelViewSet):
-    queryset = PerfilUsuario.objects.all()
+    queryset = PerfilUsuario.objects.select_related('user')
     serializer_class = PerfilUsuarioSerializer
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
         user = self.request.user
+        queryset = super().get_queryset()
         if user.perfil.tipo_usuario in ['bibliotecario', 'dba']:
-            return PerfilUsuario.objects.all()
-        return PerfilUsuario.objects.filter(user=user)
+            return queryset
+        return queryset.filter(user=user)